@@ -1111,6 +1111,7 @@ namespace FastFileFinder
 
             args.Add("--max-workers");
             args.Add(((int)numParallel.Value).ToString(CultureInfo.InvariantCulture));
+            args.Add("--spans");
 
             foreach (string argument in GetFormatArguments())
             {
@@ -1244,6 +1245,35 @@ namespace FastFileFinder
             }
         }
 
+        private static IReadOnlyList<HighlightSpan> ParseHighlights(string field, int textLength)
+        {
+            if (string.IsNullOrEmpty(field))
+            {
+                return Array.Empty<HighlightSpan>();
+            }
+
+            var spans = new List<HighlightSpan>();
+            foreach (string item in field.Split(','))
+            {
+                int separator = item.IndexOf(':');
+                if (separator <= 0
+                    || !int.TryParse(item.Substring(0, separator), NumberStyles.Integer, CultureInfo.InvariantCulture, out int start)
+                    || !int.TryParse(item.Substring(separator + 1), NumberStyles.Integer, CultureInfo.InvariantCulture, out int length))
+                {
+                    continue;
+                }
+
+                if (start < 0 || length <= 0 || start + length > textLength)
+                {
+                    continue;
+                }
+
+                spans.Add(new HighlightSpan(start, length));
+            }
+
+            return spans;
+        }
+
         private IReadOnlyList<HighlightSpan> BuildHighlights(string text)
         {
             if (string.IsNullOrEmpty(text))
@@ -1439,7 +1469,8 @@ namespace FastFileFinder
             string extension = Path.GetExtension(path);
             string extDisplay = string.IsNullOrEmpty(extension) ? string.Empty : extension.TrimStart('.');
 
-            var result = new SearchResult(path, ToDisplayPath(path), extDisplay, entry, line, snippet, BuildHighlights(snippet));
+            var highlights = parts.Length > 4 ? ParseHighlights(parts[4], snippet.Length) : BuildHighlights(snippet);
+            var result = new SearchResult(path, ToDisplayPath(path), extDisplay, entry, line, snippet, highlights);
             _pendingResults.Enqueue(result);
         }
 
@@ -1515,6 +1546,13 @@ namespace FastFileFinder
                     }
 
                     SetStatusMessage($"対象 { _queuedFiles } ファイル", TimeSpan.FromSeconds(4));
+                    break;
+                case "skipped":
+                    if (parts.Length > 1 && int.TryParse(parts[1], NumberStyles.Integer, CultureInfo.InvariantCulture, out int skipped))
+                    {
+                        SetStatusMessage($"バイナリ {skipped} ファイルをスキップ", TimeSpan.FromSeconds(6));
+                    }
+
                     break;
                 case "current":
                     if (parts.Length > 1)
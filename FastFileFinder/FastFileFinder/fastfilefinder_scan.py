@@ -2,77 +2,111 @@
 # Outputs UTF-8 TSV lines: path \t entry \t lineno \t snippet
 
 import argparse
+import bz2
+import codecs
+import datetime
+import hashlib
+import gzip
+import heapq
+import json
+import lzma
+import mmap
+import multiprocessing
+import multiprocessing.util
 import os
+import pathlib
 import platform
+import queue
 import re
 import shutil
+import sqlite3
 import subprocess
 import sys
+import tarfile
 import threading
 import time
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from io import TextIOWrapper
+import zlib
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BufferedReader, RawIOBase, TextIOWrapper
 from zipfile import BadZipFile, ZipFile
 from typing import Iterable, List, Optional, Tuple
 
 # Optional dependencies
-try:  # python-docx for .docx
-    from docx import Document  # type: ignore
-except Exception:  # pragma: no cover - dependency may be missing
-    Document = None  # type: ignore
-
-try:  # openpyxl for .xlsx
-    import openpyxl  # type: ignore
-    from openpyxl.utils.cell import get_column_letter  # type: ignore
-except Exception:  # pragma: no cover - dependency may be missing
-    openpyxl = None  # type: ignore
-    get_column_letter = None  # type: ignore
-
-try:  # xlrd for legacy .xls (requires <=1.2)
+_OPTIONAL_MODULES: dict = {}
+_OPTIONAL_MODULES_LOCK = threading.Lock()
+# Seconds spent in each loader, reported by --diag.
+_OPTIONAL_IMPORT_TIMES: dict = {}
+
+
+def _optional_import(name: str, loader):
+    """Run *loader* once and cache its result (``None`` when the import fails).
+
+    Format libraries are imported on first use, so plain-text searches and
+    process-pool workers start without paying for them.
+    """
+
+    with _OPTIONAL_MODULES_LOCK:
+        if name not in _OPTIONAL_MODULES:
+            started = time.perf_counter()
+            try:
+                _OPTIONAL_MODULES[name] = loader()
+            except Exception:  # pragma: no cover - dependency may be missing
+                _OPTIONAL_MODULES[name] = None
+            _OPTIONAL_IMPORT_TIMES[name] = time.perf_counter() - started
+        return _OPTIONAL_MODULES[name]
+
+
+def _emit_import_diag() -> None:
+    """Write the time spent importing each optional library (--diag)."""
+    with _OPTIONAL_MODULES_LOCK:
+        parts = [
+            f"{name}={seconds * 1000:.1f}ms" + ("" if _OPTIONAL_MODULES[name] is not None else "(missing)")
+            for name, seconds in _OPTIONAL_IMPORT_TIMES.items()
+        ]
+    sys.stderr.write(f"diag: imports {', '.join(parts) or 'none'}\n")
+    sys.stderr.flush()
+
+
+
+def _import_xlrd():  # xlrd for legacy .xls (requires <=1.2)
     import xlrd  # type: ignore
 
-    def _xlrd_supports_xls() -> bool:
-        try:
-            version = getattr(xlrd, "__version__", "0")
-            parts = [int(p) for p in version.split(".")[:2]]
-            return len(parts) >= 2 and (parts[0], parts[1]) < (2, 0)
-        except Exception:
-            return True
+    try:
+        version = getattr(xlrd, "__version__", "0")
+        parts = [int(p) for p in version.split(".")[:2]]
+        if len(parts) >= 2 and (parts[0], parts[1]) >= (2, 0):  # pragma: no cover - depends on environment
+            return None
+    except Exception:
+        pass
+    return xlrd
 
-    if not _xlrd_supports_xls():  # pragma: no cover - depends on environment
-        xlrd = None  # type: ignore
-except Exception:  # pragma: no cover - dependency may be missing
-    xlrd = None  # type: ignore
 
-try:  # pywin32 for legacy .doc via Word COM (Office と Python のビット数 32/64 を一致させる必要あり)
+def _import_pywin32():  # pywin32 for legacy .doc via Word COM (Office と Python のビット数 32/64 を一致させる必要あり)
     import pythoncom  # type: ignore
-    import win32com.client  # type: ignore
     import pywintypes  # type: ignore
-except Exception:  # pragma: no cover - dependency may be missing
-    pythoncom = None  # type: ignore
-    win32com = None  # type: ignore
-    pywintypes = None  # type: ignore
-
-try:  # pypdf / PyPDF2 for PDF text extraction
-    from pypdf import PdfReader  # type: ignore
-except Exception:  # pragma: no cover - dependency may be missing
+    import win32com.client  # type: ignore
+
+    return pythoncom, win32com, pywintypes
+
+
+def _import_pdf_reader():  # pypdf / PyPDF2 for PDF text extraction
     try:
+        from pypdf import PdfReader  # type: ignore
+    except ImportError:
         from PyPDF2 import PdfReader  # type: ignore
-    except Exception:  # pragma: no cover - dependency may be missing
-        PdfReader = None  # type: ignore
+    return PdfReader
 
-# Required optional packages: python-docx, openpyxl, "xlrd<2.0", pywin32
 
+def _pywin32():
+    """Return ``(pythoncom, win32com, pywintypes)``, all ``None`` without pywin32."""
+    return _optional_import("pywin32", _import_pywin32) or (None, None, None)
+
+
+# Required optional packages: "xlrd<2.0", pywin32
 
-# Common encodings to try for text files
-ENCODINGS = (
-    "utf-8-sig",
-    "utf-16-le",
-    "utf-16-be",
-    "cp932",
-    "utf-8",
-)
 
 # Ensure stdout is UTF-8
 try:
@@ -102,6 +136,24 @@ DOC_DIAG_LOCK = threading.Lock()
 DOC_DIAG_EMITTED = False
 
 DOC_WORKER_POOL: Optional["DocWorkerPool"] = None
+CONTENT_INDEX: Optional["ContentIndex"] = None
+EXTRACT_CACHE: Optional["ExtractCache"] = None
+RESULT_CACHE: Optional["ResultCache"] = None
+
+# Set inside process-pool workers: hits are collected here and sent back to
+# the parent, which stays the only writer of stdout.
+EMIT_CAPTURE: Optional[list] = None
+
+# Per-thread account of the file being scanned, kept for the result cache:
+# the hits emitted (when teed), files skipped as binary and whether the
+# extraction stopped early.
+_FILE_SCAN = threading.local()
+
+OUTPUT: Optional["OutputWriter"] = None
+# Per-stage timings collected for --stats.
+STATS: Optional["ScanStats"] = None
+# Matcher used to append highlight spans to TSV lines (--spans).
+SPAN_MATCHER = None
 
 
 def ensure_extended_path(path: str) -> str:
@@ -156,6 +208,10 @@ class DocConversionError(Exception):
         self.detail = detail or ""
 
 
+class ExtractionError(Exception):
+    """Raised by record iterators when a file could not be read completely."""
+
+
 def _clean_detail(detail: Optional[str]) -> Optional[str]:
     if not detail:
         return None
@@ -203,44 +259,116 @@ def _format_com_exception(exc: Exception) -> str:
     return ", ".join(parts)
 
 
+DOC_WORD_RECYCLE_DOCS = 200
+
+_DOC_POOL_STOP = object()
+
+
+class WordSession:
+    """A Word application kept alive across documents by one doc worker thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.converted = 0
+
+    def alive(self) -> bool:
+        try:
+            _ = self.app.Documents.Count
+        except Exception:
+            return False
+        return True
+
+    def close(self) -> None:
+        app, self.app = self.app, None
+        if app is None:
+            return
+        try:
+            app.Quit()
+        except Exception as exc:
+            _log_doc_error("Quit", "Word.Application", _format_com_exception(exc) or _error_text(exc))
+
+
 class DocWorkerPool:
-    def __init__(self, single_thread: bool):
+    """Threads that convert .doc files through Word COM, one Word instance per thread.
+
+    Each thread initializes COM once and keeps its :class:`WordSession` for
+    later documents; a session is replaced after ``recycle_after`` documents,
+    after any failed conversion, or when it stops answering. ``launcher``
+    and ``converter`` can be swapped for stand-ins where Word is unavailable.
+    """
+
+    def __init__(self, single_thread: bool, launcher=None, converter=None, recycle_after: int = DOC_WORD_RECYCLE_DOCS):
         self._single_thread = bool(single_thread)
+        self._launcher = launcher or _launch_word
+        self._converter = converter or _convert_doc_with_word
+        self._recycle_after = max(1, recycle_after)
+        self._jobs: "queue.Queue" = queue.Queue()
         max_workers = 1 if self._single_thread else max(1, min(4, (os.cpu_count() or 2)))
-        self._executor = ThreadPoolExecutor(
-            max_workers=max_workers,
-            thread_name_prefix="doc-worker",
-        )
+        self._threads = [
+            threading.Thread(target=self._work, name=f"doc-worker-{index}", daemon=True)
+            for index in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
 
-    def run(self, func, *args, **kwargs):
-        def _callable():
-            coinitialized = False
-            try:
-                if pythoncom is not None:
-                    try:
-                        pythoncom.CoInitialize()
-                    except Exception as exc:
-                        raise DocConversionError(
-                            "Init",
-                            _format_com_exception(exc) or str(exc),
-                        )
-                    coinitialized = True
-                return func(*args, **kwargs)
-            finally:
-                if coinitialized:
-                    try:
-                        pythoncom.CoUninitialize()
-                    except Exception as exc:
-                        warn_once(
-                            "coinitialize_cleanup",
-                            f"CoUninitialize で例外: {_error_text(exc)}{_format_hresult(exc)}",
-                        )
-
-        future = self._executor.submit(_callable)
+    def convert(self, path: str) -> List[str]:
+        future: Future = Future()
+        self._jobs.put((path, future))
         return future.result()
 
+    def _work(self) -> None:
+        coinitialized = False
+        init_error: Optional[DocConversionError] = None
+        pythoncom = _pywin32()[0]
+        if pythoncom is not None:
+            try:
+                pythoncom.CoInitialize()
+                coinitialized = True
+            except Exception as exc:
+                init_error = DocConversionError("Init", _format_com_exception(exc) or str(exc))
+        session: Optional[WordSession] = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is _DOC_POOL_STOP:
+                    break
+                path, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if init_error is not None:
+                        raise init_error
+                    if session is not None and (session.converted >= self._recycle_after or not session.alive()):
+                        session.close()
+                        session = None
+                    if session is None:
+                        session = WordSession(self._launcher())
+                    lines = self._converter(session.app, path)
+                    session.converted += 1
+                except BaseException as exc:
+                    if session is not None:
+                        session.close()
+                        session = None
+                    future.set_exception(exc)
+                else:
+                    future.set_result(lines)
+        finally:
+            if session is not None:
+                session.close()
+            if coinitialized:
+                try:
+                    pythoncom.CoUninitialize()
+                except Exception as exc:
+                    warn_once(
+                        "coinitialize_cleanup",
+                        f"CoUninitialize で例外: {_error_text(exc)}{_format_hresult(exc)}",
+                    )
+
     def shutdown(self) -> None:
-        self._executor.shutdown(wait=True)
+        for _ in self._threads:
+            self._jobs.put(_DOC_POOL_STOP)
+        for thread in self._threads:
+            thread.join()
 
     @property
     def single_thread(self) -> bool:
@@ -250,26 +378,220 @@ class DocWorkerPool:
 def configure_doc_workers(single_thread: bool) -> None:
     global DOC_WORKER_POOL
     if DOC_WORKER_POOL is not None:
+        if DOC_WORKER_POOL.single_thread == bool(single_thread):
+            return
         DOC_WORKER_POOL.shutdown()
     DOC_WORKER_POOL = DocWorkerPool(single_thread)
 
 
 def shutdown_doc_workers() -> None:
-    global DOC_WORKER_POOL
+    global DOC_WORKER_POOL, SOFFICE_BATCHER
     pool = DOC_WORKER_POOL
     if pool is not None:
         pool.shutdown()
         DOC_WORKER_POOL = None
+    with SOFFICE_BATCHER_LOCK:
+        batcher, SOFFICE_BATCHER = SOFFICE_BATCHER, None
+    if batcher is not None:
+        batcher.shutdown()
+
+
+OUTPUT_FLUSH_INTERVAL = 0.05
+OUTPUT_FLUSH_BYTES = 64 * 1024
+STATUS_INTERVAL_DEFAULT_MS = 100
+RATE_LIMITED_STATUS = ("current", "progress")
+
+_OUTPUT_STOP = object()
+
+
+class OutputWriter:
+    """Owns stdout: a single thread coalesces queued lines into large writes.
+
+    Hits are flushed once ``flush_interval`` has passed since the first
+    buffered line or ``flush_bytes`` are pending. ``#current``/``#progress``
+    only keep their latest value and are written at most once per
+    ``status_interval``; any other status line first flushes them so the
+    protocol order (e.g. final ``#progress`` before ``#done``) is kept.
+    """
+
+    def __init__(
+        self,
+        stream,
+        status_interval: float,
+        flush_interval: float = OUTPUT_FLUSH_INTERVAL,
+        flush_bytes: int = OUTPUT_FLUSH_BYTES,
+        prefix: str = "",
+    ):
+        self._stream = stream
+        self._prefix = prefix
+        self._status_interval = max(0.0, status_interval)
+        self._flush_interval = flush_interval
+        self._flush_bytes = flush_bytes
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._status_lock = threading.Lock()
+        self._latest: dict = {}
+        self._last_status = 0.0
+        self._broken = False
+        self._thread = threading.Thread(target=self._run, name="stdout-writer", daemon=True)
+        self._thread.start()
+
+    def write_line(self, line: str) -> None:
+        self._queue.put(self._prefix + line + "\n")
+
+    def write_status(self, tag: str, line: str) -> None:
+        line = self._prefix + line
+        if self._status_interval and tag in RATE_LIMITED_STATUS:
+            with self._status_lock:
+                self._latest[tag] = line + "\n"
+        else:
+            self._queue.put((line + "\n",))
+
+    def close(self) -> None:
+        self._queue.put(_OUTPUT_STOP)
+        self._thread.join()
+
+    def _take_statuses(self, force: bool) -> List[str]:
+        now = time.monotonic()
+        if not force and now - self._last_status < self._status_interval:
+            return []
+        with self._status_lock:
+            if not self._latest:
+                return []
+            lines = [self._latest[tag] for tag in RATE_LIMITED_STATUS if tag in self._latest]
+            self._latest.clear()
+        self._last_status = now
+        return lines
+
+    def _write(self, text: str) -> None:
+        if self._broken:
+            return
+        stats = STATS
+        if stats is not None:
+            wall, cpu = time.perf_counter(), time.thread_time()
+        with stdout_lock:
+            try:
+                self._stream.write(text)
+                self._stream.flush()
+            except (OSError, ValueError):
+                self._broken = True
+        if stats is not None:
+            stats.add("write", time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def _run(self) -> None:
+        idle_timeout = self._status_interval or None
+        stopping = False
+        while not stopping:
+            parts: List[str] = []
+            try:
+                item = self._queue.get(timeout=idle_timeout)
+            except queue.Empty:
+                item = None
+            size = 0
+            deadline = time.monotonic() + self._flush_interval
+            while item is not None:
+                if item is _OUTPUT_STOP:
+                    stopping = True
+                    break
+                if isinstance(item, tuple):
+                    parts.extend(self._take_statuses(force=True))
+                    item = item[0]
+                parts.append(item)
+                size += len(item)
+                remaining = deadline - time.monotonic()
+                if size >= self._flush_bytes or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            parts.extend(self._take_statuses(force=stopping))
+            if parts:
+                self._write("".join(parts))
+
+
+def configure_output(status_interval_ms: int, span_matcher=None, prefix: str = "") -> None:
+    global OUTPUT, SPAN_MATCHER
+    close_output()
+    SPAN_MATCHER = span_matcher
+    OUTPUT = OutputWriter(sys.stdout, status_interval_ms / 1000.0, prefix=prefix)
+
+
+def close_output() -> None:
+    global OUTPUT
+    output = OUTPUT
+    if output is not None:
+        OUTPUT = None
+        output.close()
+
+
+def begin_file_scan(tee: bool) -> None:
+    _FILE_SCAN.active = True
+    _FILE_SCAN.hits = [] if tee else None
+    _FILE_SCAN.incomplete = False
+    _FILE_SCAN.skipped = 0
+
+
+def end_file_scan() -> Tuple[list, bool, int]:
+    """Return ``(hits, complete, skipped)`` for the scan begun on this thread."""
+    state = (_FILE_SCAN.hits or [], not _FILE_SCAN.incomplete, _FILE_SCAN.skipped)
+    _FILE_SCAN.active = False
+    _FILE_SCAN.hits = None
+    return state
+
+
+def note_incomplete() -> None:
+    if getattr(_FILE_SCAN, "active", False):
+        _FILE_SCAN.incomplete = True
 
 
 def emit_tsv(path: str, entry: str, lineno: int, line: str) -> None:
+    stats = STATS
+    if stats is None or EMIT_CAPTURE is not None:
+        _emit_tsv(path, entry, lineno, line)
+        return
+    started = time.perf_counter()
+    _emit_tsv(path, entry, lineno, line)
+    stats.add("emit", time.perf_counter() - started)
+
+
+def _emit_tsv(path: str, entry: str, lineno: int, line: str) -> None:
+    tee = getattr(_FILE_SCAN, "hits", None)
+    if tee is not None:
+        tee.append((entry, lineno, line))
+    capture = EMIT_CAPTURE
+    if capture is not None:
+        capture.append((entry, lineno, line))
+        return
     line = line.replace("\t", " ").rstrip("\r\n")
+    record = f"{path}\t{entry}\t{lineno}\t{line}"
+    span_matcher = SPAN_MATCHER
+    if span_matcher is not None:
+        record += "\t" + _format_spans(line, span_matcher.spans(line))
+    output = OUTPUT
+    if output is not None:
+        output.write_line(record)
+        return
     with stdout_lock:
-        print(f"{path}\t{entry}\t{lineno}\t{line}", flush=True)
+        print(record, flush=True)
+
+
+def _format_spans(line: str, spans: List[Tuple[int, int]]) -> str:
+    """Format spans as ``start:length`` pairs in UTF-16 code units, as the UI counts them."""
+    if spans and not line.isascii() and max(line) > "\uffff":
+
+        def units(index: int) -> int:
+            return index + sum(1 for ch in line[:index] if ch > "\uffff")
+
+        spans = [(units(start), units(start + length) - units(start)) for start, length in spans]
+    return ",".join(f"{start}:{length}" for start, length in spans)
 
 
 def emit_status(tag: str, *parts: object) -> None:
     payload = "\t".join(str(p) for p in parts)
+    output = OUTPUT
+    if output is not None:
+        output.write_status(tag, f"#{tag}\t{payload}")
+        return
     with stdout_lock:
         print(f"#{tag}\t{payload}", flush=True)
 
@@ -282,21 +604,345 @@ def warn_once(kind: str, message: str) -> None:
     sys.stderr.flush()
 
 
-def iter_paths(folder: str, recursive: bool, excluded: set):
-    if recursive:
-        excluded_lower = {name.lower() for name in excluded}
-        for root, dirs, files in os.walk(folder):
-            dirs[:] = [d for d in dirs if d.lower() not in excluded_lower]
-            for name in files:
-                yield os.path.join(root, name)
-    else:
+STATS_INTERVAL = 1.0
+STATS_SLOWEST_DEFAULT = 10
+STATS_STAGES = ("walk", "scan", "read", "match", "emit", "write")
+# Stages timed per line or per hit, where a CPU clock read would cost more
+# than the work measured; only their wall time is kept.
+STATS_WALL_ONLY = frozenset({"read", "match", "emit"})
+
+
+class ScanStats:
+    """Per-stage times, per-extension counts and the slowest files (--stats).
+
+    ``walk`` is directory listing, ``scan`` the whole handling of a file,
+    ``read`` the time spent pulling lines/cells/pages out of the extractor,
+    ``match`` the rest of the file scan minus ``emit`` (formatting hits) and
+    ``write`` the stdout writes. Every thread adds to its own counters, so the
+    hot paths take no lock; :meth:`status_lines` sums them.
+    """
+
+    def __init__(self, slowest: int):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters: List[dict] = []
+        self._slowest = max(0, slowest)
+        self._slow: List[tuple] = []
+        self._sequence = 0
+
+    def _mine(self) -> dict:
+        counters = getattr(self._local, "counters", None)
+        if counters is None:
+            counters = {"stages": {}, "exts": {}}
+            self._local.counters = counters
+            with self._lock:
+                self._counters.append(counters)
+        return counters
+
+    def add(self, stage: str, wall: float, cpu: float = 0.0, count: int = 1) -> None:
+        stages = self._mine()["stages"]
+        entry = stages.get(stage)
+        if entry is None:
+            entry = stages[stage] = [0, 0.0, 0.0]
+        entry[0] += count
+        entry[1] += wall
+        entry[2] += cpu
+
+    def wall(self, *stages: str) -> float:
+        """Wall time this thread has spent in *stages* so far."""
+        mine = self._mine()["stages"]
+        return sum(mine[stage][1] for stage in stages if stage in mine)
+
+    def timed_records(self, records):
+        """Yield from *records*, adding the time spent producing each one to ``read``."""
+        iterator = iter(records)
+        clock = time.perf_counter
+        total = 0.0
+        count = 0
         try:
-            for name in os.listdir(folder):
-                p = os.path.join(folder, name)
-                if os.path.isfile(p):
-                    yield p
-        except Exception:
-            return
+            while True:
+                started = clock()
+                try:
+                    record = next(iterator)
+                except StopIteration:
+                    total += clock() - started
+                    return
+                total += clock() - started
+                count += 1
+                yield record
+        finally:
+            self.add("read", total, count=count)
+            close = getattr(records, "close", None)
+            if close is not None:
+                close()
+
+    def file_done(self, path: str, extractor: str, size: int, wall: float, cpu: float, match: float) -> None:
+        self.add("scan", wall, cpu)
+        self.add("match", match)
+        exts = self._mine()["exts"]
+        ext = normalize_ext(os.path.splitext(path)[1]) or "-"
+        entry = exts.get(ext)
+        if entry is None:
+            entry = exts[ext] = [0, 0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += size
+        entry[2] += wall
+        entry[3] += cpu
+        if self._slowest:
+            self._note_slow([(wall, path, extractor)])
+
+    def _note_slow(self, items) -> None:
+        with self._lock:
+            for wall, path, extractor in items:
+                self._sequence += 1
+                item = (wall, self._sequence, path, extractor)
+                if len(self._slow) < self._slowest:
+                    heapq.heappush(self._slow, item)
+                elif wall > self._slow[0][0]:
+                    heapq.heapreplace(self._slow, item)
+
+    def _totals(self, reset: bool = False) -> Tuple[dict, dict]:
+        stages: dict = {}
+        exts: dict = {}
+        with self._lock:
+            counters = list(self._counters)
+        for counter in counters:
+            for name, values in list(counter["stages"].items()):
+                total = stages.setdefault(name, [0, 0.0, 0.0])
+                for i, value in enumerate(values):
+                    total[i] += value
+            for ext, values in list(counter["exts"].items()):
+                total = exts.setdefault(ext, [0, 0, 0.0, 0.0])
+                for i, value in enumerate(values):
+                    total[i] += value
+            if reset:
+                counter["stages"].clear()
+                counter["exts"].clear()
+        return stages, exts
+
+    def drain(self) -> tuple:
+        """Return and reset the totals and slowest files (used by pool processes)."""
+        stages, exts = self._totals(reset=True)
+        with self._lock:
+            slow = [(wall, path, extractor) for wall, _, path, extractor in self._slow]
+            self._slow = []
+        return stages, exts, slow
+
+    def merge(self, drained: tuple) -> None:
+        stages, exts, slow = drained
+        mine = self._mine()
+        for name, values in stages.items():
+            total = mine["stages"].setdefault(name, [0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                total[i] += value
+        for ext, values in exts.items():
+            total = mine["exts"].setdefault(ext, [0, 0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                total[i] += value
+        if self._slowest:
+            self._note_slow(slow)
+
+    def status_lines(self, final: bool) -> List[tuple]:
+        """``#stats`` payloads: stages, extensions by time and, when *final*, the slowest files."""
+        stages, exts = self._totals()
+        lines = []
+        for name in STATS_STAGES:
+            if name in stages:
+                count, wall, cpu = stages[name]
+                cpu_text = "-" if name in STATS_WALL_ONLY else f"{cpu:.3f}"
+                lines.append(("stage", name, count, f"{wall:.3f}", cpu_text))
+        for ext, (files, size, wall, cpu) in sorted(exts.items(), key=lambda item: -item[1][2]):
+            lines.append(("ext", ext, files, size, f"{wall:.3f}", f"{cpu:.3f}"))
+        if final:
+            with self._lock:
+                slow = sorted(self._slow, reverse=True)
+            for wall, _, path, extractor in slow:
+                lines.append(("slow", f"{wall:.3f}", extractor, path))
+        return lines
+
+
+def configure_stats(enabled: bool, slowest: int = STATS_SLOWEST_DEFAULT) -> None:
+    global STATS
+    STATS = ScanStats(slowest) if enabled else None
+
+
+def emit_stats(final: bool = False) -> None:
+    stats = STATS
+    if stats is not None:
+        for parts in stats.status_lines(final):
+            emit_status("stats", *parts)
+
+
+WALK_DEFAULT_THREADS = 4
+WALK_QUEUE_FACTOR = 4
+WALK_PUT_TIMEOUT = 0.1
+
+_WALK_DONE = object()
+
+
+WALK_CACHE_SIZE = 65536
+
+# Directory listings kept between searches by --serve, validated by the directory mtime.
+WALK_CACHE: Optional[OrderedDict] = None
+WALK_CACHE_LOCK = threading.Lock()
+
+
+def configure_walk_cache() -> None:
+    global WALK_CACHE
+    WALK_CACHE = OrderedDict()
+
+
+def _scan_directory(path: str) -> List[tuple]:
+    """Return ``(entry, is_dir, is_symlink, is_file)`` for the children of *path*."""
+    cache = WALK_CACHE
+    mtime_ns = None
+    if cache is not None:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        with WALK_CACHE_LOCK:
+            cached = cache.get(path)
+            if cached is not None and cached[0] == mtime_ns:
+                cache.move_to_end(path)
+                return cached[1]
+    listing = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                listing.append((entry, is_dir, is_dir and entry.is_symlink(), not is_dir and entry.is_file()))
+            except OSError:
+                continue
+    if cache is not None and mtime_ns is not None:
+        with WALK_CACHE_LOCK:
+            cache[path] = (mtime_ns, listing)
+            if len(cache) > WALK_CACHE_SIZE:
+                cache.popitem(last=False)
+    return listing
+
+
+def _list_directory(path: str, recursive: bool, excluded_lower: set, accept):
+    files = []
+    subdirs = []
+    stats = STATS
+    if stats is not None:
+        wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        listing = _scan_directory(path)
+    except OSError:
+        return files, subdirs
+    finally:
+        if stats is not None:
+            stats.add("walk", time.perf_counter() - wall, time.thread_time() - cpu)
+    for entry, is_dir, is_symlink, is_file in listing:
+        if is_dir:
+            if recursive and not is_symlink and entry.name.lower() not in excluded_lower:
+                subdirs.append(entry.path)
+        elif is_file and (accept is None or accept(entry.name)):
+            files.append(entry)
+    return files, subdirs
+
+
+def walk_entries(folder: str, recursive: bool, excluded: set, accept=None, threads: int = 1):
+    """Yield ``os.DirEntry`` objects for the files under *folder*.
+
+    Excluded folder names and the ``accept(name)`` filter are applied while
+    listing, and the cached ``DirEntry`` type/stat data is reused instead of
+    stat-ing every path again. With ``threads > 1`` subdirectories are listed
+    concurrently, which hides per-directory latency on network shares.
+    """
+
+    excluded_lower = {name.lower() for name in excluded}
+    if not recursive or threads <= 1:
+        pending = [folder]
+        while pending:
+            files, subdirs = _list_directory(pending.pop(), recursive, excluded_lower, accept)
+            yield from files
+            pending.extend(reversed(subdirs))
+        return
+
+    directories: "queue.Queue" = queue.Queue()
+    batches: "queue.Queue" = queue.Queue(maxsize=threads * WALK_QUEUE_FACTOR)
+    stop = threading.Event()
+    lock = threading.Lock()
+    outstanding = [1]
+
+    def publish(item) -> None:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=WALK_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def lister() -> None:
+        while True:
+            path = directories.get()
+            if path is None:
+                return
+            files, subdirs = [], []
+            if not stop.is_set():
+                files, subdirs = _list_directory(path, True, excluded_lower, accept)
+            with lock:
+                outstanding[0] += len(subdirs)
+            for subdir in subdirs:
+                directories.put(subdir)
+            if files:
+                publish(files)
+            with lock:
+                outstanding[0] -= 1
+                finished = outstanding[0] == 0
+            if finished:
+                publish(_WALK_DONE)
+
+    listers = [
+        threading.Thread(target=lister, name=f"walk-{i}", daemon=True)
+        for i in range(threads)
+    ]
+    directories.put(folder)
+    for thread in listers:
+        thread.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is _WALK_DONE:
+                break
+            yield from batch
+    finally:
+        stop.set()
+        for _ in listers:
+            directories.put(None)
+
+
+def iter_paths(folder: str, recursive: bool, excluded: set):
+    for entry in walk_entries(folder, recursive, excluded):
+        yield entry.path
+
+
+class CandidateEntry:
+    """``os.DirEntry`` stand-in for a file taken from an earlier result set (--within)."""
+
+    __slots__ = ("path", "name")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def stat(self) -> os.stat_result:
+        return os.stat(self.path)
+
+
+def iter_candidate_entries(paths: Iterable[str], accept=None):
+    """Yield a :class:`CandidateEntry` for each existing file of *paths*, once each."""
+
+    seen = set()
+    for path in paths:
+        if path in seen:
+            continue
+        seen.add(path)
+        if (accept is None or accept(os.path.basename(path))) and os.path.isfile(path):
+            yield CandidateEntry(path)
 
 
 def normalize_ext(ext: str) -> str:
@@ -309,221 +955,1658 @@ def should_target(path: str, exts: set) -> bool:
     return normalize_ext(os.path.splitext(path)[1]) in exts
 
 
-def build_matcher(patterns: List[str], use_regex: bool, logic: str):
-    active = [p for p in patterns if p]
-    if not active:
-        raise ValueError("at least one pattern is required")
+# Extensions skipped without reading when --exts is empty.
+BINARY_EXTS = frozenset(
+    """
+    exe dll sys ocx drv com scr msi msp cab pdb ilk obj o a lib so dylib exp idb ipch pch
+    res aps ncb sdf suo class jar war pyc pyo pyd whl nupkg apk dex
+    png jpg jpeg gif bmp ico tif tiff webp psd heic cur ani
+    mp3 mp4 wav wma wmv avi mov mkv flac ogg m4a
+    7z rar lzh iso img vhd vhdx vmdk dmp mdf ldf bak
+    ttf otf woff woff2 eot db sqlite sqlite3 mdb accdb pst ost
+    ppt pptx one vsd vsdx
+    """.split()
+)
+# Extensions always decoded as text; their content is not sniffed for binary data.
+TEXT_EXTS = frozenset(
+    """
+    txt log csv tsv md rst ini cfg conf config json xml yaml yml toml html htm css
+    c h cpp hpp cc cs vb bas frm java kt py rb pl ps1 psm1 bat cmd sh js ts sql
+    """.split()
+)
 
-    logic = (logic or "and").lower()
-    require_all = logic == "and"
+SKIPPED_LOCK = threading.Lock()
+SKIPPED_FILES = 0
 
-    if use_regex:
-        regexes = [re.compile(p, re.IGNORECASE) for p in active]
 
-        def matcher(line: str):
-            if not regexes:
-                return False
-            results = (rx.search(line) is not None for rx in regexes)
-            return all(results) if require_all else any(results)
+def is_binary_name(path: str, exts: set) -> bool:
+    """Whether *path* is skipped by extension (only when no --exts filter is given)."""
+    return not exts and normalize_ext(os.path.splitext(path)[1]) in BINARY_EXTS
 
-        return matcher
 
-    lowered = [p.lower() for p in active]
+def note_skipped(count: int = 1) -> None:
+    global SKIPPED_FILES
+    with SKIPPED_LOCK:
+        SKIPPED_FILES += count
+    if getattr(_FILE_SCAN, "active", False):
+        _FILE_SCAN.skipped += count
 
-    def matcher(line: str):
-        haystack = line.lower()
-        checks = (needle in haystack for needle in lowered)
-        return all(checks) if require_all else any(checks)
 
-    return matcher
+def is_scan_target(path: str, args, exts: set) -> bool:
+    if normalize_ext(os.path.splitext(path)[1]) == "zip" or stream_archive_kind(path) is not None:
+        return bool(args.zip)
+    return should_target(path, exts)
 
 
-def scan_text_file(path: str, matcher, exts: set, perfile: int) -> int:
-    if not should_target(path, exts):
-        return 0
-    hits = 0
-    for enc in ENCODINGS:
-        try:
-            with open(path, "r", encoding=enc, errors="replace") as reader:
-                for lineno, line in enumerate(reader, 1):
-                    if matcher(line):
-                        emit_tsv(path, "", lineno, line)
-                        hits += 1
-                        if perfile and hits >= perfile:
-                            return hits
-            break
-        except UnicodeDecodeError:
-            continue
-        except (OSError, IOError):
-            return hits
-    return hits
+try:  # regex parser used for required-trigram analysis
+    import re._parser as _sre_parse  # type: ignore
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse  # type: ignore
 
+# Case folding applied before trigrams are taken, so that both ``str.lower()``
+# substring checks and ``re.IGNORECASE`` literals map onto the same grams.
+_GRAM_FOLD = (("\u0131", "i"), ("\u017f", "s"), ("\u0307", ""))
 
-def scan_zip(path: str, matcher, exts: set, perfile: int) -> int:
-    hits = 0
-    try:
-        with ZipFile(path) as zf:
-            for name in zf.namelist():
-                if exts and normalize_ext(os.path.splitext(name)[1]) not in exts:
-                    continue
-                entry_hits = 0
-                try:
-                    for enc in ENCODINGS:
-                        try:
-                            with zf.open(name, "r") as raw, TextIOWrapper(
-                                raw, encoding=enc, errors="replace"
-                            ) as reader:
-                                for lineno, line in enumerate(reader, 1):
-                                    if matcher(line):
-                                        emit_tsv(path, name, lineno, line)
-                                        entry_hits += 1
-                                        hits += 1
-                                        if perfile and entry_hits >= perfile:
-                                            break
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                except KeyError:
-                    continue
-    except BadZipFile:
-        pass
-    except Exception as exc:
-        warn_once(f"zip:{path}", f"ZIP 読み取り失敗: {path} ({exc})")
-    return hits
 
+def _gram_text(text: str) -> str:
+    lowered = text.lower()
+    if not lowered.isascii():
+        for source, target in _GRAM_FOLD:
+            lowered = lowered.replace(source, target)
+    return lowered
 
-def scan_pdf(path: str, matcher, perfile: int) -> int:
-    if PdfReader is None:
-        warn_once("pdf:missing", "PDF のテキスト抽出には pypdf または PyPDF2 が必要です")
-        return 0
 
-    try:
-        reader = PdfReader(path)
-    except Exception as exc:
-        sys.stderr.write(f"PDFを開けませんでした: {path} ({exc})\n")
-        sys.stderr.flush()
-        return 0
+def _trigrams(text: str) -> set:
+    folded = _gram_text(text)
+    return set(map("".join, zip(folded, folded[1:], folded[2:])))
 
-    hits = 0
-    pages = getattr(reader, "pages", []) or []
-    for page_index, page in enumerate(pages, 1):
-        try:
-            text = page.extract_text() or ""
-        except Exception as exc:
-            sys.stderr.write(
-                f"PDFテキスト抽出に失敗しました: {path} (page {page_index}, {exc})\n"
-            )
-            sys.stderr.flush()
+
+def _gram_and(parts: list):
+    grams = set()
+    subqueries = []
+    for part in parts:
+        if part is None:
             continue
+        if isinstance(part, frozenset):
+            grams |= part
+        elif part[0] == "and":
+            subqueries.extend(part[1])
+        else:
+            subqueries.append(part)
+    if grams:
+        subqueries.insert(0, frozenset(grams))
+    if not subqueries:
+        return None
+    if len(subqueries) == 1:
+        return subqueries[0]
+    return ("and", subqueries)
 
-        for lineno, line in enumerate(text.splitlines(), 1):
-            if matcher(line):
-                emit_tsv(path, f"page {page_index}", lineno, line)
-                hits += 1
-                if perfile and hits >= perfile:
-                    return hits
 
-    return hits
+def _gram_or(parts: list):
+    if not parts or any(part is None for part in parts):
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return ("or", parts)
 
 
-def iter_docx_lines(doc):
-    line_no = 0
-    for idx, para in enumerate(doc.paragraphs, 1):
-        text = para.text.strip()
-        line_no += 1
-        yield line_no, f"paragraph:{idx}", text
-    for t_idx, table in enumerate(doc.tables, 1):
-        for r_idx, row in enumerate(table.rows, 1):
-            cells = [cell.text.strip() for cell in row.cells]
-            text = "\t".join(cells).strip()
-            line_no += 1
-            yield line_no, f"table{t_idx}:row{r_idx}", text
+def _literal_gram_query(text: str):
+    grams = _trigrams(text)
+    return frozenset(grams) if grams else None
 
 
-def scan_docx(path: str, matcher, perfile: int) -> int:
-    if Document is None:
-        warn_once("docx", "python-docx がインストールされていないため .docx をスキップします")
-        return 0
-    hits = 0
-    try:
-        doc = Document(path)
-    except Exception as exc:
-        warn_once(f"docx:{path}", f".docx 読み込み失敗: {path} ({exc})")
-        return 0
-    for lineno, entry, text in iter_docx_lines(doc):
-        if not text:
+def _is_gram_safe_char(ch: str) -> bool:
+    # Caseless characters (CJK, digits, punctuation) only ever match themselves
+    # under IGNORECASE; ASCII letters are covered by _GRAM_FOLD.
+    return ch.isascii() or (ch.lower() == ch and ch.upper() == ch)
+
+
+def _regex_gram_query(items):
+    parts = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if run:
+            parts.append(_literal_gram_query("".join(run)))
+            run.clear()
+
+    for op, av in items:
+        if op is _sre_parse.LITERAL:
+            ch = chr(av)
+            if _is_gram_safe_char(ch):
+                run.append(ch)
+            else:
+                flush()
             continue
-        if matcher(text):
-            emit_tsv(path, entry, lineno, text)
-            hits += 1
-            if perfile and hits >= perfile:
-                break
-    return hits
+        flush()
+        if op is _sre_parse.SUBPATTERN:
+            parts.append(_regex_gram_query(av[-1]))
+        elif op is _sre_parse.BRANCH:
+            parts.append(_gram_or([_regex_gram_query(alt) for alt in av[1]]))
+        elif op in _REPEAT_OPS:
+            low, _high, body = av
+            if low >= 1:
+                parts.append(_regex_gram_query(body))
+        elif op is _ATOMIC_GROUP_OP:
+            parts.append(_regex_gram_query(av))
+    flush()
+    return _gram_and(parts)
+
+
+_REPEAT_OPS = tuple(
+    op
+    for op in (
+        getattr(_sre_parse, "MAX_REPEAT", None),
+        getattr(_sre_parse, "MIN_REPEAT", None),
+        getattr(_sre_parse, "POSSESSIVE_REPEAT", None),
+    )
+    if op is not None
+)
+_ATOMIC_GROUP_OP = getattr(_sre_parse, "ATOMIC_GROUP", object())
 
 
-def iter_xlsx_cells(workbook):
-    for sheet in workbook.worksheets:
-        title = sheet.title
-        for row_idx, row in enumerate(sheet.iter_rows(values_only=True), 1):
-            for col_idx, value in enumerate(row, 1):
-                if value is None:
-                    continue
-                text = str(value).strip()
-                if not text:
-                    continue
-                addr = f"{title}!{get_column_letter(col_idx)}{row_idx}" if get_column_letter else f"{title}!{col_idx},{row_idx}"
-                yield row_idx, addr, text
+def gram_query_matches(query, contains) -> bool:
+    """Evaluate a trigram query; ``contains(grams)`` reports whether all grams may be present."""
 
+    if query is None:
+        return True
+    if isinstance(query, frozenset):
+        return contains(query)
+    kind, parts = query
+    if kind == "and":
+        return all(gram_query_matches(part, contains) for part in parts)
+    return any(gram_query_matches(part, contains) for part in parts)
+
+
+LITERAL_TRIE_MIN_TERMS = 64
+BYTE_PATTERN_MAX_TERMS = 4
+MAX_SPANS = 128
+
+
+def _literal_trie_regex(needles: List[str]) -> str:
+    """Regex over a trie of *needles*; each needle ends in an empty group ``_q<index>``."""
+    trie: dict = {}
+    for index, needle in enumerate(needles):
+        node = trie
+        for ch in needle:
+            node = node.setdefault(ch, {})
+        node[None] = index
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in node.items() if ch is not None]
+        if None in node:
+            branches.append(f"(?P<_q{node[None]}>)")
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+def _lowered_offsets(line: str) -> Optional[List[int]]:
+    """Map offsets in ``line.lower()`` back to *line* when lowering changes the length."""
+    offsets = []
+    for index, ch in enumerate(line):
+        offsets.extend([index] * len(ch.lower()))
+    if len(offsets) == len(line):
+        return None
+    offsets.append(len(line))
+    return offsets
+
+
+class Matcher:
+    """Line predicate built from the search patterns.
+
+    Literals are tested with a tight ``in`` loop, or through one trie-shaped
+    regex once there are ``LITERAL_TRIE_MIN_TERMS`` of them; regexes are
+    compiled once and tried in turn.
+
+    ``gram_query`` describes the trigrams a line must contain to possibly
+    match, as nested ``("and"|"or", [...])`` tuples over frozensets of grams
+    (``None`` when nothing can be ruled out).
+    """
+
+    def __init__(self, patterns: List[str], use_regex: bool, require_all: bool):
+        self.patterns = list(patterns)
+        self.use_regex = use_regex
+        self.require_all = require_all
+        self._trie = None
+        if use_regex:
+            self._regexes = [re.compile(p, re.IGNORECASE) for p in patterns]
+            self._test = self._test_all_regexes if require_all else self._test_any_regex
+        else:
+            self._needles = list(dict.fromkeys(p.lower() for p in patterns))
+            if len(self._needles) >= LITERAL_TRIE_MIN_TERMS:
+                self._trie = re.compile(_literal_trie_regex(self._needles))
+                self._test = self._test_all_trie if require_all else self._test_any_trie
+            else:
+                self._test = self._test_all_needles if require_all else self._test_any_needle
+        self._gram_query = False
+        self._byte_patterns = {}
 
-def scan_xlsx(path: str, matcher, perfile: int) -> int:
-    if openpyxl is None:
-        warn_once("xlsx", "openpyxl がインストールされていないため .xlsx をスキップします")
-        return 0
-    hits = 0
-    try:
-        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-    except Exception as exc:
-        warn_once(f"xlsx:{path}", f".xlsx 読み込み失敗: {path} ({exc})")
-        return 0
-    try:
-        for lineno, entry, text in iter_xlsx_cells(wb):
-            if matcher(text):
-                emit_tsv(path, entry, lineno, text)
-                hits += 1
-                if perfile and hits >= perfile:
-                    break
-    finally:
-        try:
-            wb.close()
-        except Exception:
-            pass
-    return hits
+    def __call__(self, line: str) -> bool:
+        return self._test(line)
 
+    def _test_any_needle(self, line: str) -> bool:
+        haystack = line.lower()
+        for needle in self._needles:
+            if needle in haystack:
+                return True
+        return False
 
-WD_FORMAT_UNICODE_TEXT = 7
-MSO_AUTOMATION_SECURITY_FORCE_DISABLE = 3
-DOC_LOCK_RETRY_COUNT = 2
-DOC_LOCK_RETRY_DELAY = 0.6
-DOC_SAVEAS_POLL_INTERVAL = 0.1
-DOC_SAVEAS_MAX_WAIT = 10.0
+    def _test_all_needles(self, line: str) -> bool:
+        haystack = line.lower()
+        for needle in self._needles:
+            if needle not in haystack:
+                return False
+        return True
 
-WORD_DIAGNOSTICS_EMITTED = False
+    def _test_any_trie(self, line: str) -> bool:
+        return self._trie.search(line.lower()) is not None
 
+    def _test_all_trie(self, line: str) -> bool:
+        haystack = line.lower()
+        found = set()
+        for match in self._trie.finditer(haystack):
+            found.add(match.lastgroup)
+        if not found:
+            return False
+        if len(found) == len(self._needles):
+            return True
+        # A needle that is a prefix of a longer one is shadowed by the greedy
+        # trie match; check the ones not seen directly.
+        for index, needle in enumerate(self._needles):
+            if f"_q{index}" not in found and needle not in haystack:
+                return False
+        return True
 
-def _emit_startup_diag(perfile: int, exts_argument: str, legacy_mode: str, single_thread: bool) -> None:
-    arch = platform.architecture()[0]
-    if "64" in arch:
-        py_bits = "64"
-    elif "32" in arch:
-        py_bits = "32"
-    else:
-        py_bits = arch
+    def _test_any_regex(self, line: str) -> bool:
+        for regex in self._regexes:
+            if regex.search(line) is not None:
+                return True
+        return False
 
-    word_detect = "NG"
-    if pythoncom is not None and win32com is not None:
-        try:
-            pythoncom.CoInitialize()
-        except Exception:
+    def _test_all_regexes(self, line: str) -> bool:
+        for regex in self._regexes:
+            if regex.search(line) is None:
+                return False
+        return True
+
+    def spans(self, line: str) -> List[Tuple[int, int]]:
+        """Return sorted, non-overlapping ``(start, length)`` of the matches in *line*."""
+        found = []
+        if self.use_regex:
+            for regex in self._regexes:
+                for match in regex.finditer(line):
+                    if match.end() > match.start():
+                        found.append((match.start(), match.end()))
+                    if len(found) >= MAX_SPANS:
+                        break
+        else:
+            haystack = line.lower()
+            for needle in self._needles:
+                position = haystack.find(needle)
+                while position >= 0 and len(found) < MAX_SPANS:
+                    found.append((position, position + len(needle)))
+                    position = haystack.find(needle, position + len(needle))
+            if found and len(haystack) != len(line):
+                offsets = _lowered_offsets(line)
+                if offsets is not None:
+                    found = [(offsets[start], offsets[end]) for start, end in found]
+        found.sort()
+        merged: List[List[int]] = []
+        for start, end in found:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end - start) for start, end in merged]
+
+    @property
+    def gram_query(self):
+        if self._gram_query is False:
+            self._gram_query = self._build_gram_query()
+        return self._gram_query
+
+    def byte_pattern(self, encoding: str):
+        """Compiled bytes regex locating candidate lines in *encoding*, or ``None``.
+
+        Only literal matchers have one; a line containing no match of the
+        pattern can never satisfy the matcher.
+        """
+        if encoding not in self._byte_patterns:
+            self._byte_patterns[encoding] = self._build_byte_pattern(encoding)
+        return self._byte_patterns[encoding]
+
+    def _build_byte_pattern(self, encoding: str):
+        if self.use_regex:
+            return None
+        needles = self._needles
+        if not self.require_all and len(needles) > BYTE_PATTERN_MAX_TERMS:
+            # Past a handful of alternatives the bytes regex is slower than decoding.
+            return None
+        if self.require_all:
+            # Every needle must be on the line, so the longest one is enough.
+            needles = [max(needles, key=len)]
+        parts = []
+        for needle in needles:
+            part = _literal_byte_regex(needle, encoding)
+            if part is None:
+                return None
+            parts.append(part)
+        return re.compile(b"|".join(parts))
+
+    def _build_gram_query(self):
+        queries = []
+        for pattern in self.patterns:
+            if self.use_regex:
+                try:
+                    queries.append(_regex_gram_query(_sre_parse.parse(pattern, re.IGNORECASE)))
+                except Exception:
+                    queries.append(None)
+            else:
+                queries.append(_literal_gram_query(pattern))
+        return _gram_and(queries) if self.require_all else _gram_or(queries)
+
+
+def read_query_file(path: str) -> List[str]:
+    """Read one search pattern per line; blank lines are ignored."""
+    with open(path, "r", encoding="utf-8-sig") as reader:
+        return [line.rstrip("\r\n") for line in reader if line.strip()]
+
+
+def read_result_paths(path: str) -> List[str]:
+    """Read the files of an earlier result: the first column of its TSV lines.
+
+    Status lines (``#...``) are ignored, so a saved search output or a plain
+    list of paths can be used as is.
+    """
+    paths = []
+    with open(path, "r", encoding="utf-8-sig") as reader:
+        for line in reader:
+            line = line.rstrip("\r\n")
+            if line.strip() and not line.startswith("#"):
+                paths.append(line.partition("\t")[0])
+    return paths
+
+
+def build_matcher(patterns: List[str], use_regex: bool, logic: str) -> Matcher:
+    active = [p for p in patterns if p]
+    if not active:
+        raise ValueError("at least one pattern is required")
+
+    logic = (logic or "and").lower()
+    return Matcher(active, use_regex, logic == "and")
+
+
+def emit_records(path: str, records, matcher, perfile: int, per_entry: bool = False) -> int:
+    """Emit matching ``(lineno, entry, text)`` records and return the hit count.
+
+    ``perfile`` limits hits per file, or per archive member when ``per_entry`` is set.
+    """
+    hits = 0
+    entry_hits = {}
+    stats = STATS
+    if stats is not None:
+        records = stats.timed_records(records)
+    try:
+        for lineno, entry, text in records:
+            if per_entry:
+                group = entry.partition(ARCHIVE_LOCATOR_SEP)[0]
+                if perfile and entry_hits.get(group, 0) >= perfile:
+                    continue
+            if matcher(text):
+                emit_tsv(path, entry, lineno, text)
+                hits += 1
+                if per_entry:
+                    entry_hits[group] = entry_hits.get(group, 0) + 1
+                elif perfile and hits >= perfile:
+                    break
+    except ExtractionError:
+        note_incomplete()
+    finally:
+        close = getattr(records, "close", None)
+        if close is not None:
+            close()
+    return hits
+
+
+TEXT_SNIFF_BYTES = 64 * 1024
+TEXT_NUL_SAMPLE_BYTES = 4096
+TEXT_BINARY_SAMPLE_BYTES = 8192
+BINARY_CONTROL_RATIO = 0.3
+# Sparse NULs still mean BOM-less UTF-16 when the other byte lane has at
+# most this share of them and the sample decodes to printable text.
+UTF16_OTHER_LANE_RATIO = 0.05
+UTF16_NONPRINTABLE_RATIO = 0.02
+TEXT_MMAP_MIN_BYTES = 256 * 1024
+TEXT_ENCODING_CACHE_SIZE = 4096
+
+_TEXT_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Control bytes that do not occur in text; tab, LF, FF, CR, BS and ESC are allowed.
+_BINARY_CONTROL_BYTES = bytes(sorted(set(range(32)) - {8, 9, 10, 12, 13, 27}))
+
+_TEXT_ENCODING_CACHE = OrderedDict()
+_TEXT_ENCODING_LOCK = threading.Lock()
+_LOWER_SOURCES = None
+
+
+def _looks_binary(sample: bytes) -> bool:
+    if b"\x00" in sample:
+        return True
+    controls = sum(sample.count(byte) for byte in _BINARY_CONTROL_BYTES)
+    return controls > len(sample) * BINARY_CONTROL_RATIO
+
+
+def _decodes_as_utf16_text(sample: bytes, codec: str) -> bool:
+    """Whether *sample* decodes cleanly as *codec* into mostly printable text."""
+    try:
+        text = codecs.getincrementaldecoder(codec)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    printable = sum(1 for ch in text if ch.isprintable() or ch in "\t\r\n\f")
+    return bool(text) and printable >= len(text) * (1 - UTF16_NONPRINTABLE_RATIO)
+
+
+def sniff_text_encoding(head: bytes, detect_binary: bool = True) -> Tuple[Optional[str], int]:
+    """Guess ``(codec, bom_length)`` from the first bytes of a text file.
+
+    The codec is ``None`` when *detect_binary* is set and the data is not text.
+    """
+    for bom, codec in _TEXT_BOMS:
+        if head.startswith(bom):
+            return codec, len(bom)
+    sample = head[:TEXT_NUL_SAMPLE_BYTES]
+    if sample:
+        half = len(sample) // 2 or 1
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+            return "utf-16-le", 0
+        if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+            return "utf-16-be", 0
+        # Mostly non-ASCII UTF-16 (e.g. Japanese) only has NULs in the ASCII
+        # characters such as line breaks, so the density is low but they all
+        # sit on one byte lane.
+        if odd_nuls and even_nuls <= odd_nuls * UTF16_OTHER_LANE_RATIO:
+            if _decodes_as_utf16_text(sample, "utf-16-le"):
+                return "utf-16-le", 0
+        elif even_nuls and odd_nuls <= even_nuls * UTF16_OTHER_LANE_RATIO:
+            if _decodes_as_utf16_text(sample, "utf-16-be"):
+                return "utf-16-be", 0
+    if detect_binary and _looks_binary(head[:TEXT_BINARY_SAMPLE_BYTES]):
+        return None, 0
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return "cp932", 0
+    return "utf-8", 0
+
+
+def detect_text_encoding(key: tuple, read_head, detect_binary: bool = True) -> Tuple[Optional[str], int]:
+    """Return the sniffed ``(codec, bom_length)`` for *key*.
+
+    ``read_head(size)`` supplies the prefix on a cache miss; *key* carries the
+    path and modification stamp so edited files are sniffed again.
+    """
+    with _TEXT_ENCODING_LOCK:
+        detected = _TEXT_ENCODING_CACHE.get(key)
+        if detected is not None:
+            _TEXT_ENCODING_CACHE.move_to_end(key)
+            return detected
+    detected = sniff_text_encoding(read_head(TEXT_SNIFF_BYTES), detect_binary)
+    with _TEXT_ENCODING_LOCK:
+        _TEXT_ENCODING_CACHE[key] = detected
+        if len(_TEXT_ENCODING_CACHE) > TEXT_ENCODING_CACHE_SIZE:
+            _TEXT_ENCODING_CACHE.popitem(last=False)
+    return detected
+
+
+def _text_file_key(path: str, stat: os.stat_result) -> tuple:
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def _sniffs_binary(name: str) -> bool:
+    return normalize_ext(os.path.splitext(name)[1]) not in TEXT_EXTS
+
+
+def iter_text_lines(path: str):
+    try:
+        with open(path, "rb") as raw:
+            key = _text_file_key(path, os.fstat(raw.fileno()))
+            codec, bom = detect_text_encoding(key, raw.read, _sniffs_binary(path))
+            if codec is None:
+                note_skipped()
+                return
+            raw.seek(bom)
+            with TextIOWrapper(raw, encoding=codec, errors="replace") as reader:
+                for lineno, line in enumerate(reader, 1):
+                    yield lineno, "", line
+    except (OSError, IOError) as exc:
+        raise ExtractionError(str(exc)) from exc
+
+
+def _lower_sources() -> dict:
+    """Map each character to the BMP characters whose ``lower()`` contains it."""
+    global _LOWER_SOURCES
+    if _LOWER_SOURCES is None:
+        sources = {}
+        for code in range(0x10000):
+            if 0xD800 <= code <= 0xDFFF:
+                continue
+            ch = chr(code)
+            lowered = ch.lower()
+            if lowered != ch:
+                for target in lowered:
+                    sources.setdefault(target, []).append(ch)
+        _LOWER_SOURCES = sources
+    return _LOWER_SOURCES
+
+
+def _literal_byte_regex(needle: str, encoding: str) -> Optional[bytes]:
+    """Bytes regex matching every encoding of text whose ``lower()`` contains *needle*."""
+    if not needle or "\u0307" in needle:
+        return None
+    sources = _lower_sources()
+    parts = []
+    for ch in needle:
+        if ord(ch) > 0xFFFF:
+            return None
+        variants = []
+        for candidate in [ch] + sources.get(ch, []):
+            try:
+                encoded = candidate.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            if encoded not in variants:
+                variants.append(encoded)
+        if not variants:
+            return None
+        if len(variants) == 1:
+            parts.append(re.escape(variants[0]))
+        elif all(len(variant) == 1 for variant in variants):
+            parts.append(b"[" + b"".join(re.escape(variant) for variant in variants) + b"]")
+        else:
+            parts.append(b"(?:" + b"|".join(re.escape(variant) for variant in variants) + b")")
+    return b"".join(parts)
+
+
+def _find_unit(buffer, sub: bytes, begin: int, origin: int, width: int, end: Optional[int] = None) -> int:
+    """``buffer.find`` that skips hits straddling two code units of a *width*-byte encoding."""
+    end = len(buffer) if end is None else end
+    pos = buffer.find(sub, begin, end)
+    while pos >= 0 and (pos - origin) % width:
+        pos = buffer.find(sub, pos + 1, end)
+    return pos
+
+
+def _rfind_unit(buffer, sub: bytes, begin: int, end: int, origin: int, width: int) -> int:
+    """``buffer.rfind`` counterpart of :func:`_find_unit`."""
+    pos = buffer.rfind(sub, begin, end)
+    while pos >= 0 and (pos - origin) % width:
+        pos = buffer.rfind(sub, begin, pos + len(sub) - 1)
+    return pos
+
+
+def _count_units(buffer, sub: bytes, begin: int, end: int, origin: int, width: int) -> int:
+    if width == 1:
+        return buffer[begin:end].count(sub)
+    count = 0
+    pos = _find_unit(buffer, sub, begin, origin, width, end)
+    while pos >= 0:
+        count += 1
+        pos = _find_unit(buffer, sub, pos + width, origin, width, end)
+    return count
+
+
+def _search_text_buffer(path: str, key: tuple, buffer, matcher, perfile: int) -> Optional[int]:
+    codec, start = detect_text_encoding(key, lambda size: buffer[:size], _sniffs_binary(path))
+    if codec is None:
+        note_skipped()
+        return 0
+    pattern = matcher.byte_pattern(codec)
+    if pattern is None:
+        return None
+    newline = "\n".encode(codec)
+    carriage = "\r".encode(codec)
+    if buffer.find(carriage, start) != -1:
+        # Text mode also splits on a lone CR; leave such files to the slow path.
+        if re.search(re.escape(carriage) + b"(?!" + re.escape(newline) + b")", buffer) is not None:
+            return None
+    width = len(newline)
+    end = len(buffer)
+    hits = 0
+    lineno = 1
+    counted = start
+    pos = start
+    while pos < end:
+        found = pattern.search(buffer, pos)
+        if found is None:
+            break
+        if (found.start() - start) % width:
+            # UTF-16 bytes can match across two code units ("\u0a41\u4e00" holds b"\n\0").
+            pos = found.start() + 1
+            continue
+        line_start = _rfind_unit(buffer, newline, start, found.start(), start, width)
+        line_start = start if line_start < 0 else line_start + width
+        line_end = _find_unit(buffer, newline, found.start(), start, width)
+        line_end = end if line_end < 0 else line_end + width
+        lineno += _count_units(buffer, newline, counted, line_start, start, width)
+        counted = line_start
+        line = buffer[line_start:line_end].decode(codec, errors="replace")
+        if line.endswith("\r\n"):
+            line = line[:-2] + "\n"
+        if matcher(line):
+            emit_tsv(path, "", lineno, line)
+            hits += 1
+            if perfile and hits >= perfile:
+                break
+        pos = line_end
+    return hits
+
+
+def scan_text_bytes(path: str, matcher, perfile: int) -> Optional[int]:
+    """Literal fast path: search the raw bytes and decode only candidate lines.
+
+    Returns ``None`` when the file has to go through :func:`iter_text_lines`.
+    """
+    try:
+        with open(path, "rb") as fh:
+            stat = os.fstat(fh.fileno())
+            if stat.st_size == 0:
+                return 0
+            key = _text_file_key(path, stat)
+            if stat.st_size < TEXT_MMAP_MIN_BYTES:
+                return _search_text_buffer(path, key, fh.read(), matcher, perfile)
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _search_text_buffer(path, key, mapped, matcher, perfile)
+    except (OSError, ValueError):
+        return None
+
+
+def scan_text_file(path: str, matcher, exts: set, perfile: int) -> int:
+    if not should_target(path, exts):
+        return 0
+    if not matcher.use_regex:
+        hits = scan_text_bytes(path, matcher, perfile)
+        if hits is not None:
+            return hits
+    return emit_records(path, iter_text_lines(path), matcher, perfile)
+
+
+ARCHIVE_MAX_DEPTH = 3
+ARCHIVE_MAX_BYTES = 1024 * 1024 * 1024
+ARCHIVE_MAX_RATIO = 100
+# Nested zips and documents larger than this are spooled to a temporary file
+# instead of memory, so one member cannot take the whole --zip-max-mb per thread.
+ARCHIVE_MEMBER_MEMORY_BYTES = 64 * 1024 * 1024
+ARCHIVE_COPY_CHUNK = 1024 * 1024
+# Separates an archive member from the location inside it ("a.xlsx:Sheet1!A1").
+ARCHIVE_LOCATOR_SEP = ":"
+
+ARCHIVE_WORKERS = 1
+ARCHIVE_POOL: Optional[ThreadPoolExecutor] = None
+ARCHIVE_POOL_LOCK = threading.Lock()
+
+
+def configure_archives(max_depth: int, max_mb: int, max_ratio: int, workers: int) -> None:
+    """Set the nesting/size limits for archives and how many members are scanned at once."""
+    global ARCHIVE_MAX_DEPTH, ARCHIVE_MAX_BYTES, ARCHIVE_MAX_RATIO, ARCHIVE_WORKERS
+    if max(1, workers) != ARCHIVE_WORKERS:
+        shutdown_archives()
+    ARCHIVE_MAX_DEPTH = max(0, max_depth)
+    ARCHIVE_MAX_BYTES = max_mb * 1024 * 1024 if max_mb > 0 else sys.maxsize
+    ARCHIVE_MAX_RATIO = max(1, max_ratio)
+    ARCHIVE_WORKERS = max(1, workers)
+
+
+def shutdown_archives() -> None:
+    global ARCHIVE_POOL
+    with ARCHIVE_POOL_LOCK:
+        pool, ARCHIVE_POOL = ARCHIVE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _archive_pool() -> ThreadPoolExecutor:
+    global ARCHIVE_POOL
+    with ARCHIVE_POOL_LOCK:
+        if ARCHIVE_POOL is None:
+            ARCHIVE_POOL = ThreadPoolExecutor(max_workers=ARCHIVE_WORKERS, thread_name_prefix="zip-member")
+        return ARCHIVE_POOL
+
+
+def archive_formats(args) -> dict:
+    """Map document extensions scanned inside archives to their extractor kind."""
+    formats = {}
+    if args.word:
+        formats["docx"] = "docx"
+    if args.excel:
+        formats["xlsx"] = "xlsx:values" if args.excel_numbers else "xlsx:strings"
+    if args.pdf:
+        formats["pdf"] = "pdf"
+    return formats
+
+
+def _zip_text_key(path: str) -> tuple:
+    return _text_file_key(path, os.stat(path))
+
+
+def _iter_zip_entry_lines(zf: ZipFile, name: str, key: tuple):
+    with zf.open(name, "r") as raw:
+        codec, bom = detect_text_encoding(key + (name,), raw.read, _sniffs_binary(name))
+        if codec is None:
+            return
+        raw.seek(bom)
+        with TextIOWrapper(raw, encoding=codec, errors="replace") as reader:
+            for lineno, line in enumerate(reader, 1):
+                yield lineno, line
+
+
+def _spool_member(zf: ZipFile, info):
+    """Copy a member into memory, or a temporary file beyond ``ARCHIVE_MEMBER_MEMORY_BYTES``."""
+    spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_MEMBER_MEMORY_BYTES)
+    try:
+        with zf.open(info) as member:
+            shutil.copyfileobj(member, spool, ARCHIVE_COPY_CHUNK)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+class ArchiveReader:
+    """Walks a zip on disk, descending into nested zips and Office/PDF members.
+
+    Members are streamed from the archive; nested archives and documents are
+    copied into memory, or into a temporary file when they are larger than
+    ``ARCHIVE_MEMBER_MEMORY_BYTES``. Every member counts its declared
+    uncompressed size against one ``ARCHIVE_MAX_BYTES`` budget, members
+    compressed better than ``ARCHIVE_MAX_RATIO`` are skipped, and nesting
+    stops at ``ARCHIVE_MAX_DEPTH``.
+    """
+
+    def __init__(self, path: str, exts: set, formats: dict):
+        self.path = path
+        self.exts = exts
+        self.formats = formats
+        self.key = _zip_text_key(path)
+        self._remaining = ARCHIVE_MAX_BYTES
+        self._lock = threading.Lock()
+
+    def _wanted(self, info) -> bool:
+        if info.is_dir():
+            return False
+        ext = normalize_ext(os.path.splitext(info.filename)[1])
+        if ext == "zip":
+            return True
+        if self.exts and ext not in self.exts:
+            return False
+        return ext in self.formats or not is_binary_name(info.filename, self.exts)
+
+    def _admit(self, info, label: str) -> bool:
+        if info.file_size > max(info.compress_size, 1) * ARCHIVE_MAX_RATIO:
+            warn_once(
+                f"zip-ratio:{self.path}:{label}",
+                f"圧縮率が上限を超えるためスキップしました: {self.path} → {label}",
+            )
+            return False
+        with self._lock:
+            if info.file_size > self._remaining:
+                self._remaining = 0
+                warn_once(f"zip-budget:{self.path}", f"展開サイズの上限に達したため残りをスキップしました: {self.path}")
+                return False
+            self._remaining -= info.file_size
+        return True
+
+    def member_records(self, zf: ZipFile, info, matcher=None, depth: int = 0, prefix: str = ""):
+        """Yield ``(lineno, entry, text)`` for one member, recursing into nested zips."""
+
+        label = prefix + info.filename
+        ext = normalize_ext(os.path.splitext(info.filename)[1])
+        if ext == "zip" and depth >= ARCHIVE_MAX_DEPTH:
+            warn_once(f"zip-depth:{self.path}:{label}", f"入れ子が深すぎるためスキップしました: {self.path} → {label}")
+            return
+        if not self._admit(info, label):
+            return
+        try:
+            if ext == "zip":
+                with _spool_member(zf, info) as spooled, ZipFile(spooled) as inner:
+                    for member in inner.infolist():
+                        if self._wanted(member):
+                            yield from self.member_records(inner, member, matcher, depth + 1, label + "/")
+                return
+            kind = self.formats.get(ext)
+            if kind is None:
+                for lineno, line in _iter_zip_entry_lines(zf, info.filename, self.key + (prefix,)):
+                    yield lineno, label, line
+                return
+            source = f"{self.path} → {label}"
+            with _spool_member(zf, info) as stream:
+                if kind == "docx":
+                    records = iter_docx_records(stream, source)
+                elif kind == "pdf":
+                    records = iter_pdf_records(stream, source)
+                else:
+                    records = iter_xlsx_records(stream, kind == "xlsx:values", matcher, source)
+                for lineno, entry, text in records:
+                    yield lineno, f"{label}{ARCHIVE_LOCATOR_SEP}{entry}" if entry else label, text
+        except (ExtractionError, KeyError):
+            return
+        except (BadZipFile, RuntimeError, NotImplementedError, EOFError, OSError, zlib.error) as exc:
+            warn_once(f"zip:{self.path}:{label}", f"ZIP 内のファイルを読み取れません: {self.path} → {label} ({exc})")
+
+    def records(self):
+        with ZipFile(self.path) as zf:
+            for info in zf.infolist():
+                if self._wanted(info):
+                    yield from self.member_records(zf, info)
+
+    def _scan_member(self, info, matcher, perfile: int) -> List[tuple]:
+        # Each task opens its own handle so members decompress independently.
+        hits: List[tuple] = []
+        counts: dict = {}
+        with ZipFile(self.path) as zf:
+            for lineno, entry, text in self.member_records(zf, info, matcher):
+                group = entry.partition(ARCHIVE_LOCATOR_SEP)[0]
+                if perfile and counts.get(group, 0) >= perfile:
+                    continue
+                if matcher(text):
+                    hits.append((entry, lineno, text))
+                    counts[group] = counts.get(group, 0) + 1
+        return hits
+
+    def scan(self, matcher, perfile: int) -> int:
+        with ZipFile(self.path) as zf:
+            members = [info for info in zf.infolist() if self._wanted(info)]
+        if ARCHIVE_WORKERS > 1 and len(members) > 1:
+            pool = _archive_pool()
+            futures = [pool.submit(self._scan_member, info, matcher, perfile) for info in members]
+            batches = (future.result() for future in futures)
+        else:
+            futures = []
+            batches = (self._scan_member(info, matcher, perfile) for info in members)
+        hits = 0
+        try:
+            for batch in batches:
+                for entry, lineno, text in batch:
+                    emit_tsv(self.path, entry, lineno, text)
+                hits += len(batch)
+        finally:
+            for future in futures:
+                future.cancel()
+        return hits
+
+
+def scan_zip(path: str, matcher, exts: set, perfile: int, formats: Optional[dict] = None) -> int:
+    try:
+        return ArchiveReader(path, exts, formats or {}).scan(matcher, perfile)
+    except BadZipFile:
+        return 0
+    except Exception as exc:
+        warn_once(f"zip:{path}", f"ZIP 読み取り失敗: {path} ({exc})")
+        return 0
+
+
+def iter_zip_records(path: str, exts: set, formats: Optional[dict] = None):
+    try:
+        yield from ArchiveReader(path, exts, formats or {}).records()
+    except BadZipFile:
+        return
+    except Exception as exc:
+        warn_once(f"zip:{path}", f"ZIP 読み取り失敗: {path} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+
+# Single-file compressors, keyed by extension ("app.log.gz" holds "app.log").
+COMPRESSED_OPENERS = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tbz", ".tar.xz", ".txz")
+# Index kinds whose records carry an archive member in the entry column.
+ARCHIVE_KINDS = frozenset({"zip", "tar"}) | frozenset(COMPRESSED_OPENERS)
+STREAM_ARCHIVE_ERRORS = (tarfile.TarError, OSError, EOFError, zlib.error, lzma.LZMAError)
+
+
+def stream_archive_kind(path: str) -> Optional[str]:
+    """Return ``"tar"``, ``"gz"``, ``"bz2"`` or ``"xz"`` for streamable archives, else ``None``."""
+    lowered = path.lower()
+    if lowered.endswith(TAR_SUFFIXES):
+        return "tar"
+    ext = normalize_ext(os.path.splitext(lowered)[1])
+    return ext if ext in COMPRESSED_OPENERS else None
+
+
+class _PrefixedReader(RawIOBase):
+    """Replays bytes already read for sniffing, then continues with *raw*."""
+
+    def __init__(self, prefix: bytes, raw):
+        self._prefix = prefix
+        self._raw = raw
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._raw.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _iter_stream_lines(raw, key: tuple, name: str):
+    """Decode a forward-only stream like a text file, sniffing its head once."""
+
+    head = b""
+
+    def read_head(size: int) -> bytes:
+        nonlocal head
+        head = raw.read(size)
+        return head
+
+    codec, bom = detect_text_encoding(key + (name,), read_head, _sniffs_binary(name))
+    if codec is None:
+        return
+    if head:
+        prefix = head[bom:]
+    else:
+        raw.read(bom)
+        prefix = b""
+    with TextIOWrapper(BufferedReader(_PrefixedReader(prefix, raw)), encoding=codec, errors="replace") as reader:
+        for lineno, line in enumerate(reader, 1):
+            yield lineno, line
+
+
+def _stream_member_wanted(name: str, exts: set) -> bool:
+    if exts and normalize_ext(os.path.splitext(name)[1]) not in exts:
+        return False
+    return not is_binary_name(name, exts)
+
+
+def iter_tar_records(path: str, exts: set):
+    """Stream the text members of a (compressed) tar as ``(lineno, member, text)``."""
+    try:
+        key = _zip_text_key(path)
+        with tarfile.open(path, mode="r|*") as tf:
+            for member in tf:
+                if not member.isfile() or not _stream_member_wanted(member.name, exts):
+                    continue
+                raw = tf.extractfile(member)
+                if raw is None:
+                    continue
+                for lineno, line in _iter_stream_lines(raw, key, member.name):
+                    yield lineno, member.name, line
+    except STREAM_ARCHIVE_ERRORS as exc:
+        warn_once(f"tar:{path}", f"アーカイブ読み取り失敗: {path} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+
+def iter_compressed_records(path: str, kind: str, exts: set):
+    """Stream a single gzip/bzip2/xz file; the entry is the name without the suffix."""
+    name = os.path.basename(path)[: -len(kind) - 1]
+    if not _stream_member_wanted(name, exts):
+        return
+    try:
+        with COMPRESSED_OPENERS[kind](path, "rb") as raw:
+            for lineno, line in _iter_stream_lines(raw, _zip_text_key(path), name):
+                yield lineno, name, line
+    except STREAM_ARCHIVE_ERRORS as exc:
+        warn_once(f"{kind}:{path}", f"アーカイブ読み取り失敗: {path} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+
+def iter_stream_archive_records(path: str, kind: str, exts: set):
+    if kind == "tar":
+        return iter_tar_records(path, exts)
+    return iter_compressed_records(path, kind, exts)
+
+
+def scan_stream_archive(path: str, kind: str, matcher, exts: set, perfile: int) -> int:
+    return emit_records(path, iter_stream_archive_records(path, kind, exts), matcher, perfile, per_entry=True)
+
+
+PDF_PARALLEL_MIN_PAGES = 64
+PDF_PAGE_CHUNK = 16
+# Page ranges submitted ahead of the one being consumed, per worker process.
+PDF_PAGE_WINDOW_FACTOR = 2
+
+PDF_PAGE_WORKERS = 1
+PDF_PAGE_POOL: Optional[ProcessPoolExecutor] = None
+PDF_PAGE_POOL_LOCK = threading.Lock()
+
+# Reader reused by consecutive page ranges of the same file inside a page worker.
+_PDF_WORKER_READER: Optional[tuple] = None
+
+
+def configure_pdf_pages(workers: int) -> None:
+    """Allow large PDFs to be split across *workers* processes (1 extracts serially)."""
+    global PDF_PAGE_WORKERS
+    if max(1, workers) != PDF_PAGE_WORKERS:
+        shutdown_pdf_pages()
+    PDF_PAGE_WORKERS = max(1, workers)
+
+
+def shutdown_pdf_pages() -> None:
+    global PDF_PAGE_POOL
+    with PDF_PAGE_POOL_LOCK:
+        pool, PDF_PAGE_POOL = PDF_PAGE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _pdf_page_pool() -> ProcessPoolExecutor:
+    global PDF_PAGE_POOL
+    with PDF_PAGE_POOL_LOCK:
+        if PDF_PAGE_POOL is None:
+            workers = PDF_PAGE_WORKERS
+            if os.name == "nt":
+                workers = min(workers, PROCESS_MAX_WORKERS_WINDOWS)
+            PDF_PAGE_POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return PDF_PAGE_POOL
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[Tuple[str, Optional[str]]]:
+    """Extract pages ``start``..``stop - 1`` of *path* in a page worker.
+
+    Returns ``(text, error)`` per page; ``error`` is set when the page failed.
+    """
+
+    global _PDF_WORKER_READER
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if _PDF_WORKER_READER is None or _PDF_WORKER_READER[0] != key:
+        _PDF_WORKER_READER = (key, _optional_import("pdf", _import_pdf_reader)(path))
+    pages = _PDF_WORKER_READER[1].pages
+    results = []
+    for index in range(start, stop):
+        try:
+            results.append((pages[index].extract_text() or "", None))
+        except Exception as exc:
+            results.append(("", str(exc)))
+    return results
+
+
+def _iter_pdf_pages_serial(reader, count: int):
+    for index in range(count):
+        try:
+            yield reader.pages[index].extract_text() or "", None
+        except Exception as exc:
+            yield "", str(exc)
+
+
+def _iter_pdf_pages_parallel(path: str, count: int):
+    """Yield ``(text, error)`` in page order while page ranges run on the page pool.
+
+    Only a window of ranges is queued ahead; closing the generator (for example
+    when ``--perfile`` is reached) cancels the ranges not yet started.
+    """
+
+    pool = _pdf_page_pool()
+    ranges = iter(range(0, count, PDF_PAGE_CHUNK))
+    pending: deque = deque()
+    window = PDF_PAGE_WORKERS * PDF_PAGE_WINDOW_FACTOR
+
+    def submit_next() -> None:
+        start = next(ranges, None)
+        if start is not None:
+            pending.append(pool.submit(_extract_pdf_pages, path, start, min(start + PDF_PAGE_CHUNK, count)))
+
+    try:
+        for _ in range(window):
+            submit_next()
+        while pending:
+            chunk = pending.popleft().result()
+            submit_next()
+            yield from chunk
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf_records(path, source: Optional[str] = None):
+    source = source or path
+    PdfReader = _optional_import("pdf", _import_pdf_reader)
+    if PdfReader is None:
+        warn_once("pdf:missing", "PDF のテキスト抽出には pypdf または PyPDF2 が必要です")
+        raise ExtractionError("pypdf/PyPDF2 unavailable")
+
+    try:
+        reader = PdfReader(path)
+        count = len(getattr(reader, "pages", []) or [])
+    except Exception as exc:
+        sys.stderr.write(f"PDFを開けませんでした: {source} ({exc})\n")
+        sys.stderr.flush()
+        raise ExtractionError(str(exc)) from exc
+
+    if PDF_PAGE_WORKERS > 1 and count >= PDF_PARALLEL_MIN_PAGES and isinstance(path, str):
+        pages = _iter_pdf_pages_parallel(path, count)
+    else:
+        pages = _iter_pdf_pages_serial(reader, count)
+
+    failed_pages = 0
+    try:
+        for page_index, (text, error) in enumerate(pages, 1):
+            if error is not None:
+                sys.stderr.write(
+                    f"PDFテキスト抽出に失敗しました: {source} (page {page_index}, {error})\n"
+                )
+                sys.stderr.flush()
+                failed_pages += 1
+                continue
+
+            for lineno, line in enumerate(text.splitlines(), 1):
+                yield lineno, f"page {page_index}", line
+    except Exception as exc:
+        # A page worker died or the pool was shut down underneath us.
+        raise ExtractionError(str(exc)) from exc
+    finally:
+        pages.close()
+
+    if failed_pages:
+        raise ExtractionError(f"{failed_pages} page(s) could not be extracted")
+
+
+def scan_pdf(path: str, matcher, perfile: int) -> int:
+    return emit_records(path, cached_records(path, "pdf", iter_pdf_records), matcher, perfile)
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY = _W_NS + "body"
+_W_P = _W_NS + "p"
+_W_R = _W_NS + "r"
+_W_T = _W_NS + "t"
+_W_BR = _W_NS + "br"
+_W_HYPERLINK = _W_NS + "hyperlink"
+_W_TBL = _W_NS + "tbl"
+_W_TR = _W_NS + "tr"
+_W_TC = _W_NS + "tc"
+_W_TC_PR = _W_NS + "tcPr"
+_W_TR_PR = _W_NS + "trPr"
+_W_GRID_SPAN = _W_NS + "gridSpan"
+_W_GRID_BEFORE = _W_NS + "gridBefore"
+_W_V_MERGE = _W_NS + "vMerge"
+_W_VAL = _W_NS + "val"
+_W_TYPE = _W_NS + "type"
+# Run children other than w:t / w:br and their text equivalents.
+_DOCX_RUN_TEXT = {
+    _W_NS + "tab": "\t",
+    _W_NS + "ptab": "\t",
+    _W_NS + "cr": "\n",
+    _W_NS + "noBreakHyphen": "-",
+}
+_OFFICE_DOCUMENT_REL = "/officeDocument"
+
+
+def _ooxml_relationships(zf: ZipFile, part: str) -> List[Tuple[str, str, str]]:
+    """Return ``(id, type, part name)`` for the relationships of *part* ("" for the package)."""
+    folder, name = part.rpartition("/")[::2]
+    rels_name = f"{folder}/_rels/{name}.rels" if folder else f"_rels/{name}.rels"
+    try:
+        root = ElementTree.fromstring(zf.read(rels_name))
+    except KeyError:
+        return []
+    found = []
+    for rel in root:
+        target = rel.get("Target", "")
+        if not target or rel.get("TargetMode") == "External":
+            continue
+        if target.startswith("/"):
+            target = target[1:]
+        elif folder:
+            target = f"{folder}/{target}"
+        parts = []
+        for piece in target.split("/"):
+            if piece == "..":
+                if parts:
+                    parts.pop()
+            elif piece and piece != ".":
+                parts.append(piece)
+        found.append((rel.get("Id", ""), rel.get("Type", ""), "/".join(parts)))
+    return found
+
+
+def _ooxml_main_part(zf: ZipFile, default: str) -> str:
+    for _, rel_type, target in _ooxml_relationships(zf, ""):
+        if rel_type.endswith(_OFFICE_DOCUMENT_REL):
+            return target
+    return default
+
+
+def _int_attr(elem, name: str, default: int) -> int:
+    try:
+        return int(elem.get(name, default))
+    except ValueError:
+        return default
+
+
+def iter_docx_lines(stream):
+    """Stream ``word/document.xml`` into python-docx style records.
+
+    Body paragraphs come first as ``paragraph:N``, followed by the rows of
+    top-level tables as ``tableT:rowR`` (cells tab-joined, merged cells
+    repeated), so only the row text is buffered; parsed elements are dropped
+    as soon as they are consumed.
+    """
+    stack = []
+    para = None
+    para_depth = 0
+    paragraphs = 0
+    tables = 0
+    table_depth = -1
+    rows = []
+    row = None
+    row_index = 0
+    grid_before = 0
+    above = {}
+    cell = None
+    cell_paras: List[str] = []
+    cell_span = 1
+    cell_merge = None
+    for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth = len(stack)
+            if tag == _W_P and depth and (stack[-1].tag == _W_BODY or stack[-1] is cell):
+                para = []
+                para_depth = depth
+            elif tag == _W_TBL and depth and stack[-1].tag == _W_BODY:
+                tables += 1
+                table_depth = depth
+                row_index = 0
+                above = {}
+            elif tag == _W_TR and depth == table_depth + 1:
+                row = []
+                grid_before = 0
+            elif tag == _W_TC and row is not None and depth == table_depth + 2:
+                cell = elem
+                cell_paras = []
+                cell_span = 1
+                cell_merge = None
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if para is not None and depth > para_depth:
+            if stack[-1].tag == _W_R and (
+                depth == para_depth + 2
+                or (depth == para_depth + 3 and stack[para_depth + 1].tag == _W_HYPERLINK)
+            ):
+                if tag == _W_T:
+                    para.append(elem.text or "")
+                elif tag == _W_BR:
+                    if elem.get(_W_TYPE, "textWrapping") == "textWrapping":
+                        para.append("\n")
+                elif tag in _DOCX_RUN_TEXT:
+                    para.append(_DOCX_RUN_TEXT[tag])
+            continue
+        if tag == _W_P and para is not None and depth == para_depth:
+            text = "".join(para)
+            para = None
+            if cell is not None:
+                cell_paras.append(text)
+            else:
+                paragraphs += 1
+                yield paragraphs, f"paragraph:{paragraphs}", text.strip()
+        elif cell is not None and depth == table_depth + 4 and stack[-1].tag == _W_TC_PR:
+            if tag == _W_GRID_SPAN:
+                cell_span = max(1, _int_attr(elem, _W_VAL, 1))
+            elif tag == _W_V_MERGE:
+                cell_merge = elem.get(_W_VAL, "continue")
+        elif tag == _W_GRID_BEFORE and row is not None and depth == table_depth + 3:
+            if stack[-1].tag == _W_TR_PR:
+                grid_before = max(0, _int_attr(elem, _W_VAL, 0))
+        elif tag == _W_TC and elem is cell:
+            row.append((cell_span, cell_merge, "\n".join(cell_paras)))
+            cell = None
+        elif tag == _W_TR and row is not None and depth == table_depth + 1:
+            offset = grid_before
+            current = {}
+            texts = []
+            for span, merge, text in row:
+                if merge == "continue":
+                    text = above.get(offset, "")
+                for column in range(offset, offset + span):
+                    current[column] = text
+                texts.extend([text.strip()] * span)
+                offset += span
+            above = current
+            row = None
+            row_index += 1
+            rows.append((f"table{tables}:row{row_index}", "\t".join(texts).strip()))
+            stack[-1].remove(elem)
+        elif tag == _W_TBL and depth == table_depth:
+            table_depth = -1
+        if depth and stack[-1].tag == _W_BODY:
+            stack[-1].remove(elem)
+
+    lineno = paragraphs
+    for entry, text in rows:
+        lineno += 1
+        yield lineno, entry, text
+
+
+def iter_docx_records(path, source: Optional[str] = None):
+    source = source or path
+    try:
+        with ZipFile(path) as zf, zf.open(_ooxml_main_part(zf, "word/document.xml")) as stream:
+            for lineno, entry, text in iter_docx_lines(stream):
+                if text:
+                    yield lineno, entry, text
+    except (BadZipFile, KeyError, ElementTree.ParseError, OSError) as exc:
+        warn_once(f"docx:{source}", f".docx 読み込み失敗: {source} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+
+def scan_docx(path: str, matcher, perfile: int) -> int:
+    return emit_records(path, cached_records(path, "docx", iter_docx_records), matcher, perfile)
+
+
+_X_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_X_SHEET = _X_NS + "sheet"
+_X_SHEET_DATA = _X_NS + "sheetData"
+_X_WORKBOOK_PR = _X_NS + "workbookPr"
+_X_ROW = _X_NS + "row"
+_X_C = _X_NS + "c"
+_X_V = _X_NS + "v"
+_X_IS = _X_NS + "is"
+_X_SI = _X_NS + "si"
+_X_T = _X_NS + "t"
+_X_R = _X_NS + "r"
+_X_NUM_FMT = _X_NS + "numFmt"
+_X_CELL_XFS = _X_NS + "cellXfs"
+_X_XF = _X_NS + "xf"
+_R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_XLSX_STRING_TYPES = ("s", "inlineStr", "str")
+# Sheets referencing only shared strings carry none of these markers.
+_XLSX_OWN_TEXT_MARKERS = (b"inlineStr", b'"str"', b"'str'")
+_XLSX_SCAN_CHUNK = 1 << 20
+_CELL_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+
+# Built-in number formats that openpyxl reads as dates or times.
+_XLSX_BUILTIN_DATE_FORMATS = {
+    14: "mm-dd-yy",
+    15: "d-mmm-yy",
+    16: "d-mmm",
+    17: "mmm-yy",
+    18: "h:mm AM/PM",
+    19: "h:mm:ss AM/PM",
+    20: "h:mm",
+    21: "h:mm:ss",
+    22: "m/d/yy h:mm",
+    45: "mm:ss",
+    46: "[h]:mm:ss",
+    47: "mmss.0",
+}
+_DATE_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_DATE_FORMAT_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_TIMEDELTA_FORMAT_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+_EXCEL_EPOCH_1904 = datetime.datetime(1904, 1, 1)
+
+
+def _xlsx_text(elem) -> str:
+    """Text of an ``si`` / ``is`` element: plain ``t`` plus rich-text runs, without phonetics."""
+    parts = []
+    for child in elem:
+        if child.tag == _X_T:
+            parts.append(child.text or "")
+        elif child.tag == _X_R:
+            run_text = child.find(_X_T)
+            if run_text is not None:
+                parts.append(run_text.text or "")
+    return "".join(parts)
+
+
+def _read_shared_strings(zf: ZipFile, part: Optional[str]) -> List[str]:
+    strings: List[str] = []
+    if not part:
+        return strings
+    with zf.open(part) as stream:
+        for _, elem in ElementTree.iterparse(stream):
+            if elem.tag == _X_SI:
+                strings.append(_xlsx_text(elem).replace("x005F_", ""))
+                elem.clear()
+    return strings
+
+
+def _read_date_styles(zf: ZipFile, part: Optional[str]) -> Tuple[set, set]:
+    """Return the cell style indexes formatted as dates and as durations."""
+    dates, durations = set(), set()
+    if not part:
+        return dates, durations
+    root = ElementTree.fromstring(zf.read(part))
+    formats = dict(_XLSX_BUILTIN_DATE_FORMATS)
+    for fmt in root.iter(_X_NUM_FMT):
+        try:
+            formats[int(fmt.get("numFmtId", ""))] = fmt.get("formatCode", "")
+        except ValueError:
+            continue
+    cell_xfs = root.find(_X_CELL_XFS)
+    for index, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+        if xf.tag != _X_XF:
+            continue
+        try:
+            code = formats.get(int(xf.get("numFmtId", "0")))
+        except ValueError:
+            continue
+        if not code:
+            continue
+        code = code.split(";")[0]
+        if _DATE_FORMAT_RE.search(_DATE_FORMAT_STRIP_RE.sub("", code)):
+            dates.add(index)
+            if _TIMEDELTA_FORMAT_RE.search(code):
+                durations.add(index)
+    return dates, durations
+
+
+def _excel_serial_text(value: float, epoch: datetime.datetime, duration: bool) -> str:
+    """Render a date-formatted serial the way openpyxl's ``from_excel`` would."""
+    if duration:
+        delta = datetime.timedelta(days=value)
+        if delta.microseconds:
+            delta = datetime.timedelta(
+                seconds=delta.total_seconds() // 1, microseconds=round(delta.microseconds, -3)
+            )
+        return str(delta)
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return str((datetime.datetime.min + diff).time())
+    if 0 < value < 60 and epoch is _EXCEL_EPOCH:
+        day += 1
+    return str(epoch + datetime.timedelta(days=day) + diff)
+
+
+class _XlsxValues:
+    """Renders non-string cells (numbers, dates, booleans, errors) for --excel-numbers."""
+
+    def __init__(self, zf: ZipFile, styles_part: Optional[str], date1904: bool):
+        self.dates, self.durations = _read_date_styles(zf, styles_part)
+        self.epoch = _EXCEL_EPOCH_1904 if date1904 else _EXCEL_EPOCH
+
+    def text(self, cell_type: str, raw: str, style: int) -> str:
+        if cell_type == "n":
+            number = float(raw) if ("." in raw or "E" in raw or "e" in raw) else int(raw)
+            if style in self.dates:
+                try:
+                    return _excel_serial_text(number, self.epoch, style in self.durations)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return str(number)
+        if cell_type == "b":
+            return str(bool(int(raw)))
+        return raw
+
+
+def _xlsx_sheet_has_own_text(zf: ZipFile, part: str) -> bool:
+    """Whether a sheet holds inline or formula strings, checked on the raw XML bytes."""
+    keep = max(len(marker) for marker in _XLSX_OWN_TEXT_MARKERS)
+    tail = b""
+    with zf.open(part) as stream:
+        while True:
+            chunk = stream.read(_XLSX_SCAN_CHUNK)
+            if not chunk:
+                return False
+            window = tail + chunk
+            if any(marker in window for marker in _XLSX_OWN_TEXT_MARKERS):
+                return True
+            tail = window[-keep:]
+
+
+def _iter_xlsx_sheet(stream, title: str, strings: List[str], values, wanted: Optional[set]):
+    """Yield ``(row, "Sheet!A1", text)`` for the cells of one worksheet part.
+
+    Shared-string cells whose index is not in *wanted* are skipped; *values*
+    renders non-string cells, which are dropped when it is ``None``.
+    """
+    sheet_data = None
+    row_node = None
+    row_number = 0
+    column = 0
+    for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == _X_ROW:
+                row_node = elem
+                try:
+                    row_number = int(elem.get("r", ""))
+                except ValueError:
+                    row_number += 1
+                column = 0
+            elif tag == _X_SHEET_DATA:
+                sheet_data = elem
+            continue
+        if tag == _X_C:
+            cell_type = elem.get("t", "n")
+            ref = elem.get("r")
+            match = _CELL_REF_RE.match(ref) if ref else None
+            if match is not None:
+                address = ref
+                row = int(match.group(2))
+                column = 0
+                for letter in match.group(1):
+                    column = column * 26 + ord(letter) - 64
+            else:
+                column += 1
+                address = f"{_excel_column_name(column - 1)}{row_number}"
+                row = row_number
+            text = None
+            if cell_type == "inlineStr":
+                inline = elem.find(_X_IS)
+                if inline is not None:
+                    text = _xlsx_text(inline)
+            else:
+                raw = elem.findtext(_X_V)
+                if raw:
+                    if cell_type == "s":
+                        index = int(raw)
+                        if wanted is None or index in wanted:
+                            text = strings[index]
+                    elif cell_type == "str":
+                        text = raw
+                    elif values is not None:
+                        try:
+                            style = int(elem.get("s", "0"))
+                        except ValueError:
+                            style = 0
+                        text = values.text(cell_type, raw, style)
+            if row_node is not None:
+                row_node.remove(elem)
+            if text:
+                text = text.strip()
+                if text:
+                    yield row, f"{title}!{address}", text
+        elif tag == _X_ROW:
+            if sheet_data is not None:
+                sheet_data.remove(elem)
+            row_node = None
+
+
+def iter_xlsx_records(path, numbers: bool = False, matcher=None, source: Optional[str] = None):
+    """Stream the cells of every worksheet as ``(row, "Sheet!A1", text)``.
+
+    Only string cells are read unless *numbers* is set. With a *matcher*, the
+    shared-string table is tested once and cells or whole sheets that cannot
+    match are skipped, so the records are only good for that matcher.
+    """
+    source = source or path
+    try:
+        with ZipFile(path) as zf:
+            workbook = _ooxml_main_part(zf, "xl/workbook.xml")
+            rels = {rel_id: (rel_type, target) for rel_id, rel_type, target in _ooxml_relationships(zf, workbook)}
+            root = ElementTree.fromstring(zf.read(workbook))
+            shared_part = styles_part = None
+            for rel_type, target in rels.values():
+                if rel_type.endswith("/sharedStrings"):
+                    shared_part = target
+                elif rel_type.endswith("/styles"):
+                    styles_part = target
+            strings = _read_shared_strings(zf, shared_part)
+            values = None
+            if numbers:
+                props = root.find(_X_WORKBOOK_PR)
+                date1904 = props is not None and props.get("date1904", "0").lower() in ("1", "true")
+                values = _XlsxValues(zf, styles_part, date1904)
+            wanted = None
+            if matcher is not None:
+                wanted = {index for index, text in enumerate(strings) if matcher(text.strip())}
+            for sheet in root.iter(_X_SHEET):
+                rel_type, part = rels.get(sheet.get(_R_ID), ("", ""))
+                if not rel_type.endswith("/worksheet"):
+                    continue
+                try:
+                    zf.getinfo(part)
+                except KeyError:
+                    continue
+                if wanted is not None and not wanted and values is None:
+                    if not _xlsx_sheet_has_own_text(zf, part):
+                        continue
+                with zf.open(part) as stream:
+                    yield from _iter_xlsx_sheet(stream, sheet.get("name", ""), strings, values, wanted)
+    except (BadZipFile, KeyError, IndexError, ValueError, ElementTree.ParseError, OSError) as exc:
+        warn_once(f"xlsx:{source}", f".xlsx 読み込み失敗: {source} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+
+def scan_xlsx(path: str, matcher, perfile: int, numbers: bool = False) -> int:
+    return emit_records(path, iter_xlsx_records(path, numbers, matcher), matcher, perfile)
+
+
+WD_FORMAT_UNICODE_TEXT = 7
+MSO_AUTOMATION_SECURITY_FORCE_DISABLE = 3
+DOC_LOCK_RETRY_COUNT = 2
+DOC_LOCK_RETRY_DELAY = 0.6
+DOC_SAVEAS_POLL_INTERVAL = 0.1
+DOC_SAVEAS_MAX_WAIT = 10.0
+
+WORD_DIAGNOSTICS_EMITTED = False
+
+
+def _emit_startup_diag(perfile: int, exts_argument: str, legacy_mode: str, single_thread: bool) -> None:
+    arch = platform.architecture()[0]
+    if "64" in arch:
+        py_bits = "64"
+    elif "32" in arch:
+        py_bits = "32"
+    else:
+        py_bits = arch
+
+    word_detect = "NG"
+    pythoncom, win32com, _ = _pywin32()
+    if pythoncom is not None and win32com is not None:
+        try:
+            pythoncom.CoInitialize()
+        except Exception:
             pass
         else:
             try:
@@ -558,7 +2641,9 @@ def _emit_startup_diag(perfile: int, exts_argument: str, legacy_mode: str, singl
 
 
 def _error_text(exc: Exception) -> str:
-    if pywintypes is not None and isinstance(exc, pywintypes.com_error):
+    # A COM error can only exist once pywin32 has been imported, so do not import it here.
+    pywin32 = _OPTIONAL_MODULES.get("pywin32")
+    if pywin32 is not None and isinstance(exc, pywin32[2].com_error):
         try:
             if len(exc.args) >= 2 and isinstance(exc.args[1], str) and exc.args[1]:
                 return exc.args[1]
@@ -606,7 +2691,7 @@ def _emit_word_diagnostics(word) -> None:
         pass
     python_bits = platform.architecture()[0]
     try:
-        pywin32_version = getattr(win32com.client, "__version__", "unknown")
+        pywin32_version = getattr(_pywin32()[1].client, "__version__", "unknown")
     except Exception:
         pywin32_version = "unknown"
     diag = (
@@ -666,6 +2751,7 @@ def _emit_doc_diag_if_needed(word) -> None:
         pass
 
     gencache_display = "unavailable"
+    win32com = _pywin32()[1]
     if win32com is not None:
         try:
             cache_path = win32com.client.gencache.GetGeneratePath()
@@ -756,27 +2842,23 @@ def _describe_word_launch_failure(exc: Exception) -> str:
     return reason
 
 
-def _convert_doc_via_com(path: str) -> List[str]:
+def _launch_word():
+    """Start Word through COM and apply the automation settings used for conversion."""
+    pythoncom, win32com, _ = _pywin32()
     if pythoncom is None or win32com is None:
         raise DocConversionError(
             "Init",
             "pywin32 がインストールされていないため Word COM を利用できません (必要に応じて 'python -m pywin32_postinstall -install' を実行してください)",
         )
 
-    original_path = path
-    temp_path: Optional[str] = None
-    word = None
-    doc = None
-    last_open_args: Optional[dict] = None
-
     try:
-        try:
-            word = win32com.client.gencache.EnsureDispatch("Word.Application")
-        except Exception as exc:  # pragma: no cover - depends on Word availability
-            reason = _describe_word_launch_failure(exc)
-            detail = ", ".join(part for part in [reason, _format_com_exception(exc)] if part)
-            raise DocConversionError("Launch", detail)
+        word = win32com.client.gencache.EnsureDispatch("Word.Application")
+    except Exception as exc:  # pragma: no cover - depends on Word availability
+        reason = _describe_word_launch_failure(exc)
+        detail = ", ".join(part for part in [reason, _format_com_exception(exc)] if part)
+        raise DocConversionError("Launch", detail)
 
+    try:
         try:
             word.Visible = True
         except Exception as exc:
@@ -816,7 +2898,19 @@ def _convert_doc_via_com(path: str) -> List[str]:
 
         _emit_word_diagnostics(word)
         _emit_doc_diag_if_needed(word)
+    except Exception as exc:
+        WordSession(word).close()
+        raise DocConversionError("Launch", _format_com_exception(exc) or _error_text(exc))
+    return word
+
+
+def _convert_doc_with_word(word, path: str) -> List[str]:
+    original_path = path
+    temp_path: Optional[str] = None
+    doc = None
+    last_open_args: Optional[dict] = None
 
+    try:
         normalized_path = os.path.abspath(path)
         candidates: List[str] = []
         seen = set()
@@ -908,11 +3002,6 @@ def _convert_doc_via_com(path: str) -> List[str]:
                 doc.Close(False)
             except Exception as exc:
                 _log_doc_error("Close", path, _format_com_exception(exc) or _error_text(exc))
-        if word is not None:
-            try:
-                word.Quit()
-            except Exception as exc:
-                _log_doc_error("Quit", path, _format_com_exception(exc) or _error_text(exc))
         if temp_path:
             try:
                 os.remove(temp_path)
@@ -926,6 +3015,15 @@ def _convert_doc_via_com(path: str) -> List[str]:
                     _log_doc_error("Cleanup", temp_path, detail)
 
 
+def _convert_doc_via_com(path: str) -> List[str]:
+    """Convert *path* on the doc worker pool, reusing that worker's Word instance."""
+    pool = DOC_WORKER_POOL
+    if pool is None:
+        configure_doc_workers(DOC_DIAG_CONTEXT.get("single_thread", False))
+        pool = DOC_WORKER_POOL
+    return pool.convert(path)
+
+
 def _find_soffice_executable() -> Optional[str]:
     candidates = ["soffice", "soffice.exe"]
     for candidate in candidates:
@@ -935,37 +3033,169 @@ def _find_soffice_executable() -> Optional[str]:
     return None
 
 
-def _locate_converted_txt(temp_dir: str, source_path: str) -> Optional[str]:
-    expected = os.path.join(temp_dir, os.path.splitext(os.path.basename(source_path))[0] + ".txt")
-    if os.path.exists(expected):
-        return expected
-    try:
-        for name in os.listdir(temp_dir):
-            if name.lower().endswith(".txt"):
-                candidate = os.path.join(temp_dir, name)
-                if os.path.isfile(candidate):
-                    return candidate
-    except Exception:
-        return None
-    return None
+SOFFICE_BATCH_SIZE = 32
+SOFFICE_BATCH_WAIT = 0.3
+
+SOFFICE_BATCHER: Optional["SofficeBatcher"] = None
+SOFFICE_BATCHER_LOCK = threading.Lock()
+
+
+class SofficeBatcher:
+    """Convert .doc files with LibreOffice, several documents per ``soffice`` run.
+
+    Requests arriving within ``wait`` seconds of each other are converted by
+    one invocation (at most ``batch_size`` files), so LibreOffice start-up is
+    paid once per chunk. All runs share a private user profile, which keeps
+    them from handing work to an already running LibreOffice.
+    """
+
+    def __init__(self, executable: str, batch_size: int = SOFFICE_BATCH_SIZE, wait: float = SOFFICE_BATCH_WAIT):
+        self._executable = executable
+        self._batch_size = max(1, batch_size)
+        self._wait = max(0.0, wait)
+        self._profile_dir = tempfile.mkdtemp(prefix="fff_soffice_profile_")
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._work, name="soffice-batch", daemon=True)
+        self._thread.start()
+
+    def convert(self, path: str) -> List[str]:
+        future: Future = Future()
+        self._jobs.put((path, future))
+        return future.result()
+
+    def _work(self) -> None:
+        pending: List[Tuple[str, Future]] = []
+        stopping = False
+        while pending or not stopping:
+            if not pending:
+                job = self._jobs.get()
+                if job is _DOC_POOL_STOP:
+                    break
+                pending.append(job)
+            deadline = time.monotonic() + self._wait
+            while not stopping and len(pending) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._jobs.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is _DOC_POOL_STOP:
+                    stopping = True
+                else:
+                    pending.append(job)
+            chunk: List[Tuple[str, Future]] = []
+            deferred: List[Tuple[str, Future]] = []
+            stems = set()
+            for job in pending:
+                # soffice names each output after its source, so equal names wait for the next run.
+                stem = os.path.normcase(os.path.splitext(os.path.basename(job[0]))[0])
+                if stem in stems or len(chunk) >= self._batch_size:
+                    deferred.append(job)
+                    continue
+                stems.add(stem)
+                chunk.append(job)
+            pending = deferred
+            self._convert_chunk([job for job in chunk if job[1].set_running_or_notify_cancel()])
+
+    def _convert_chunk(self, chunk: List[Tuple[str, Future]]) -> None:
+        if not chunk:
+            return
+        temp_dir = tempfile.mkdtemp(prefix="fff_soffice_")
+        try:
+            command = [
+                self._executable,
+                "-env:UserInstallation=" + pathlib.Path(self._profile_dir).as_uri(),
+                "--headless",
+                "--convert-to",
+                "txt:Text",
+                "--outdir",
+                temp_dir,
+            ]
+            command.extend(os.path.abspath(path) for path, _ in chunk)
+            try:
+                completed = subprocess.run(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                )
+            except FileNotFoundError as exc:
+                failure = DocConversionError("soffice-launch", f"Launch failed: {_error_text(exc)}")
+            except Exception as exc:
+                failure = DocConversionError("soffice-run", f"Execution failed: {_error_text(exc)}")
+            else:
+                failure = None
+                if completed.returncode != 0:
+                    message = completed.stderr.strip() or completed.stdout.strip()
+                    detail = f"stderr={message}" if message else None
+                    failure = DocConversionError(f"soffice-exit={completed.returncode}", detail)
+            if failure is not None and not os.listdir(temp_dir):
+                for _, future in chunk:
+                    future.set_exception(failure)
+                return
+
+            for path, future in chunk:
+                output_path = os.path.join(temp_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+                if not os.path.isfile(output_path):
+                    future.set_exception(
+                        failure or DocConversionError("soffice-output-missing", "LibreOffice が txt を生成しませんでした")
+                    )
+                    continue
+                try:
+                    with open(output_path, "r", encoding="utf-8", errors="replace") as reader:
+                        future.set_result(reader.read().splitlines())
+                except Exception as exc:
+                    detail = f"Read failed: {_error_text(exc)}{_format_hresult(exc)}"
+                    future.set_exception(DocConversionError("soffice-read", detail))
+        except BaseException as exc:
+            for _, future in chunk:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def shutdown(self) -> None:
+        self._jobs.put(_DOC_POOL_STOP)
+        self._thread.join()
+        shutil.rmtree(self._profile_dir, ignore_errors=True)
 
 
 def _convert_doc_via_soffice(path: str) -> List[str]:
-    soffice = _find_soffice_executable()
-    if not soffice:
-        raise DocConversionError("soffice-not-found", "soffice.exe が見つからないため LibreOffice 変換を利用できません")
+    global SOFFICE_BATCHER
+    with SOFFICE_BATCHER_LOCK:
+        batcher = SOFFICE_BATCHER
+        if batcher is None:
+            soffice = _find_soffice_executable()
+            if not soffice:
+                raise DocConversionError("soffice-not-found", "soffice.exe が見つからないため LibreOffice 変換を利用できません")
+            batcher = SOFFICE_BATCHER = SofficeBatcher(soffice)
+    return batcher.convert(path)
 
-    temp_dir = tempfile.mkdtemp(prefix="fff_soffice_")
-    try:
-        command = [
-            soffice,
-            "--headless",
-            "--convert-to",
-            "txt:Text",
-            "--outdir",
-            temp_dir,
-            os.path.abspath(path),
-        ]
+
+def _find_antiword_executable() -> Optional[str]:
+    candidates = ["antiword", "antiword.exe"]
+    for candidate in candidates:
+        path = shutil.which(candidate)
+        if path:
+            return path
+    return None
+
+
+def _convert_doc_via_antiword(path: str) -> List[str]:
+    antiword = _find_antiword_executable()
+    if not antiword:
+        raise DocConversionError("antiword-not-found", "antiword が PATH 上に見つかりません")
+
+    commands = [
+        [antiword, "-m", "UTF-8.txt", os.path.abspath(path)],
+        [antiword, os.path.abspath(path)],
+    ]
+    last_failure: Optional[subprocess.CompletedProcess] = None
+    for command in commands:
         try:
             completed = subprocess.run(
                 command,
@@ -977,205 +3207,1213 @@ def _convert_doc_via_soffice(path: str) -> List[str]:
             )
         except FileNotFoundError as exc:
             detail = f"Launch failed: {_error_text(exc)}"
-            raise DocConversionError("soffice-launch", detail)
+            raise DocConversionError("antiword-launch", detail)
         except Exception as exc:
             detail = f"Execution failed: {_error_text(exc)}"
-            raise DocConversionError("soffice-run", detail)
-        if completed.returncode != 0:
-            message = completed.stderr.strip() or completed.stdout.strip()
-            detail = f"stderr={message}" if message else None
-            raise DocConversionError(f"soffice-exit={completed.returncode}", detail)
+            raise DocConversionError("antiword-run", detail)
+        if completed.returncode == 0:
+            output = completed.stdout or ""
+            return output.replace("\r\n", "\n").splitlines()
+        last_failure = completed
 
-        output_path = _locate_converted_txt(temp_dir, path)
-        if not output_path:
-            raise DocConversionError("soffice-output-missing", "LibreOffice が txt を生成しませんでした")
+    if last_failure is not None:
+        message = last_failure.stderr.strip() or last_failure.stdout.strip()
+        detail = f"stderr={message}" if message else None
+        raise DocConversionError(f"antiword-exit={last_failure.returncode}", detail)
+
+    raise DocConversionError("antiword", "antiword での変換に失敗しました")
 
+
+def iter_doc_legacy_lines(path: str, mode: str) -> Iterable[str]:
+    converters = []
+    normalized_mode = (mode or "").lower()
+    if normalized_mode in {"com", "auto"}:
+        converters.append(_convert_doc_via_com)
+    if normalized_mode in {"auto", "external"}:
+        converters.append(_convert_doc_via_soffice)
+        converters.append(_convert_doc_via_antiword)
+
+    for converter in converters:
         try:
-            with open(output_path, "r", encoding="utf-8", errors="replace") as reader:
-                return reader.read().splitlines()
-        except Exception as exc:
-            detail = f"Read failed: {_error_text(exc)}{_format_hresult(exc)}"
-            raise DocConversionError("soffice-read", detail)
+            lines = converter(path)
+        except DocConversionError as exc:
+            _log_doc_error(exc.stage, path, exc.detail)
+            continue
+        except Exception as exc:  # pragma: no cover - unexpected path
+            _log_doc_error("unexpected", path, str(exc))
+            continue
+
+        for line in lines:
+            yield line
+        return
+
+    raise ExtractionError("no .doc converter succeeded")
+
+
+def iter_doc_legacy_records(path: str, mode: str):
+    for lineno, line in enumerate(iter_doc_legacy_lines(path, mode), 1):
+        yield lineno, "", line
+
+
+def scan_doc_legacy(path: str, matcher, perfile: int, legacy_mode: str) -> int:
+    records = cached_records(path, "doc", lambda p: iter_doc_legacy_records(p, legacy_mode))
+    hits = emit_records(path, records, matcher, perfile)
+    _log_doc_stage("Emit", f"{path} hits={hits}")
+    return hits
+
+
+def _excel_column_name(index: int) -> str:
+    name = ""
+    i = index
+    while i >= 0:
+        i, remainder = divmod(i, 26)
+        name = chr(65 + remainder) + name
+        i -= 1
+    return name
+
+
+def iter_xls_rows(path: str):
+    """Yield the non-empty rows of every sheet as ``(row, sheet name, row_values)``.
+
+    Rows are read whole with ``row_values`` and kept as raw values, which is
+    the compact form the extract cache stores for ``.xls``.
+    """
+    xlrd = _optional_import("xlrd", _import_xlrd)
+    if xlrd is None:
+        warn_once("xls", "xlrd<=1.2 がインストールされていないため .xls をスキップします")
+        raise ExtractionError("xlrd unavailable")
+
+    try:
+        workbook = xlrd.open_workbook(path, on_demand=True, ragged_rows=True)
+    except Exception as exc:
+        warn_once(f"xls:{path}", f".xls 読み込み失敗: {path} ({exc})")
+        raise ExtractionError(str(exc)) from exc
+
+    try:
+        for sheet_idx in range(workbook.nsheets):
+            try:
+                sheet = workbook.sheet_by_index(sheet_idx)
+            except Exception as exc:
+                warn_once(f"xls:{path}", f".xls 読み込み失敗: {path} ({exc})")
+                continue
+            for row_idx in range(sheet.nrows):
+                try:
+                    values = sheet.row_values(row_idx)
+                except Exception:
+                    continue
+                if any(value != "" and value is not None for value in values):
+                    yield row_idx + 1, sheet.name, values
+            workbook.unload_sheet(sheet_idx)
     finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        try:
+            workbook.release_resources()
+        except Exception:
+            pass
 
 
-def _find_antiword_executable() -> Optional[str]:
-    candidates = ["antiword", "antiword.exe"]
-    for candidate in candidates:
-        path = shutil.which(candidate)
-        if path:
-            return path
-    return None
+def iter_xls_records(path: str, matcher=None):
+    """Yield the non-empty cells of every sheet as ``(row, "Sheet!A1", text)``.
+
+    Rows come from the extract cache when enabled. With a literal *matcher*,
+    each row is tested once as a joined buffer and only matching cells of
+    rows that pass are turned into records, so the records are only good
+    for that matcher.
+    """
+    # Regexes may anchor on the cell boundaries, so only literal matchers can prefilter rows.
+    row_filter = matcher is not None and not matcher.use_regex
+    for row, sheet_name, values in cached_records(path, "xls:rows", iter_xls_rows):
+        if row_filter:
+            texts = [str(value) for value in values if value != "" and value is not None]
+            if not matcher("\n".join(texts)):
+                continue
+        for col_idx, value in enumerate(values):
+            if value == "" or value is None:
+                continue
+            text = str(value).strip()
+            if not text or (matcher is not None and not matcher(text)):
+                continue
+            yield row, f"{sheet_name}!{_excel_column_name(col_idx)}{row}", text
+
+
+def scan_xls_legacy(path: str, matcher, perfile: int) -> int:
+    return emit_records(path, iter_xls_records(path, matcher), matcher, perfile)
+
+
+INDEX_FILE_NAME = "fastfilefinder-index.sqlite3"
+INDEX_SCHEMA_VERSION = 3
+INDEX_COMMIT_INTERVAL = 256
+INDEX_BUSY_TIMEOUT = 30.0
+INDEX_BLOCK_RECORDS = 256
+BLOOM_BITS_PER_GRAM = 4
+BLOOM_MIN_BITS = 64
+BLOOM_MAX_BITS = 1 << 20
+
+
+def _encode_records(records: List[tuple]) -> bytes:
+    payload = json.dumps(records, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(payload.encode("utf-8"), 1)
+
+
+def _decode_records(blob: bytes) -> List[tuple]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _record_size(record) -> int:
+    """Rough uncompressed size of *record*, to stop collecting entries that cannot be cached."""
+    size = 0
+    for field in record:
+        if isinstance(field, str):
+            size += len(field)
+        elif isinstance(field, (list, tuple)):
+            size += _record_size(field)
+        else:
+            size += 8
+    return size
+
+
+def _gram_digest(gram: str) -> int:
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+def _bloom_positions(digest: int, size: int) -> Tuple[int, int]:
+    return digest & (size - 1), ((digest * 0x9E3779B1) >> 32) & (size - 1)
+
+
+def _build_bloom(digests: set) -> Tuple[int, bytes]:
+    size = BLOOM_MIN_BITS
+    target = min(BLOOM_MAX_BITS, len(digests) * BLOOM_BITS_PER_GRAM)
+    while size < target:
+        size <<= 1
+    bits = bytearray(size >> 3)
+    mask = size - 1
+    for digest in digests:
+        first = digest & mask
+        second = ((digest * 0x9E3779B1) >> 32) & mask
+        bits[first >> 3] |= 1 << (first & 7)
+        bits[second >> 3] |= 1 << (second & 7)
+    return size, bytes(bits)
+
+
+class GramProbe:
+    """Tests a matcher's trigram query against stored Bloom filters."""
+
+    def __init__(self, query):
+        self.query = query
+        self._masks = {}
+
+    def _mask(self, grams: frozenset, size: int) -> int:
+        key = (grams, size)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = 0
+            for gram in grams:
+                for pos in _bloom_positions(_gram_digest(gram), size):
+                    mask |= 1 << pos
+            self._masks[key] = mask
+        return mask
+
+    def may_match(self, size: int, blob: bytes) -> bool:
+        if self.query is None:
+            return True
+        value = int.from_bytes(blob, "little")
+
+        def contains(grams: frozenset) -> bool:
+            mask = self._mask(grams, size)
+            return value & mask == mask
+
+        return gram_query_matches(self.query, contains)
+
+
+class ContentIndex:
+    """On-disk store of extracted records keyed by path, size and mtime.
+
+    Records are kept in blocks, each with a trigram Bloom filter, and every
+    file carries the union filter. Unchanged files are answered from the
+    stored blocks, skipping files and blocks whose filters rule the query
+    out; everything else is re-extracted and written back.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, INDEX_FILE_NAME),
+            timeout=INDEX_BUSY_TIMEOUT,
+            check_same_thread=False,
+        )
+        self._pending = 0
+        self._seen = set()
+        self._probe: Optional[GramProbe] = None
+        self._probe_owner = None
+        self.reused = 0
+        self.pruned = 0
+        self.extracted = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != INDEX_SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS files")
+                self._conn.execute("DROP TABLE IF EXISTS blocks")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " bloom_bits INTEGER NOT NULL,"
+                " bloom BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                " path TEXT NOT NULL,"
+                " block INTEGER NOT NULL,"
+                " bloom_bits INTEGER NOT NULL,"
+                " bloom BLOB NOT NULL,"
+                " records BLOB NOT NULL,"
+                " PRIMARY KEY (path, block))"
+            )
+            self._conn.execute(f"PRAGMA user_version={INDEX_SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def _probe_for(self, matcher) -> GramProbe:
+        probe = self._probe
+        if probe is None or self._probe_owner is not matcher:
+            probe = GramProbe(getattr(matcher, "gram_query", None))
+            self._probe = probe
+            self._probe_owner = matcher
+        return probe
+
+    def _lookup(self, key: str, st: os.stat_result, kind: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, kind, bloom_bits, bloom FROM files WHERE path = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, stored_kind, bloom_bits, bloom = row
+        if size != st.st_size or mtime_ns != st.st_mtime_ns or stored_kind != kind:
+            return None
+        return bloom_bits, bloom
+
+    def _iter_candidate_records(self, key: str, probe: GramProbe):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bloom_bits, bloom, records FROM blocks WHERE path = ? ORDER BY block",
+                (key,),
+            ).fetchall()
+        for bloom_bits, bloom, blob in rows:
+            if not probe.may_match(bloom_bits, bloom):
+                continue
+            try:
+                records = _decode_records(blob)
+            except Exception as exc:
+                raise ExtractionError(f"corrupt index block: {exc}") from exc
+            yield from records
+
+    def _store(self, key: str, st: os.stat_result, kind: str, records: List[tuple]) -> None:
+        blocks = []
+        file_digests = set()
+        for block_no, start in enumerate(range(0, len(records), INDEX_BLOCK_RECORDS)):
+            chunk = records[start:start + INDEX_BLOCK_RECORDS]
+            # Grams spanning the joining newline never occur in a query; they
+            # only cost a little filter density.
+            grams = _trigrams("\n".join(text for _lineno, _entry, text in chunk))
+            digests = set(map(_gram_digest, grams))
+            file_digests |= digests
+            bloom_bits, bloom = _build_bloom(digests)
+            blocks.append((key, block_no, bloom_bits, bloom, _encode_records(chunk)))
+        file_bits, file_bloom = _build_bloom(file_digests)
+
+        with self._lock:
+            self._conn.execute("DELETE FROM blocks WHERE path = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO blocks (path, block, bloom_bits, bloom, records) VALUES (?, ?, ?, ?, ?)",
+                blocks,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, kind, bloom_bits, bloom)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime_ns, kind, file_bits, file_bloom),
+            )
+            self._pending += 1
+            if self._pending >= INDEX_COMMIT_INTERVAL:
+                self._conn.commit()
+                self._pending = 0
+
+    def scan(
+        self,
+        path: str,
+        kind: str,
+        records_factory,
+        matcher,
+        perfile: int,
+        dir_entry: Optional[os.DirEntry] = None,
+    ) -> int:
+        key = os.path.abspath(path)
+        try:
+            st = dir_entry.stat() if dir_entry is not None else os.stat(path)
+        except OSError:
+            return 0
+        with self._lock:
+            self._seen.add(key)
+
+        per_entry = extractor_name(kind) in ARCHIVE_KINDS
+        probe = self._probe_for(matcher)
+        cached = self._lookup(key, st, kind)
+        if cached is not None:
+            self.reused += 1
+            if not probe.may_match(*cached):
+                self.pruned += 1
+                return 0
+            return emit_records(path, self._iter_candidate_records(key, probe), matcher, perfile, per_entry)
+
+        collected: List[tuple] = []
+        complete = True
+        try:
+            for record in records_factory():
+                collected.append(tuple(record))
+        except ExtractionError:
+            complete = False
+            note_incomplete()
+        hits = emit_records(path, collected, matcher, perfile, per_entry)
+        if complete:
+            self.extracted += 1
+            try:
+                self._store(key, st, kind, collected)
+            except sqlite3.Error as exc:
+                warn_once("index:write", f"インデックスへの書き込みに失敗しました: {exc}")
+        return hits
+
+    def mark_seen(self, path: str) -> None:
+        with self._lock:
+            self._seen.add(os.path.abspath(path))
+
+    def counts(self) -> Tuple[int, int, int]:
+        return self.reused, self.pruned, self.extracted
+
+    def add_counts(self, delta: Tuple[int, int, int]) -> None:
+        with self._lock:
+            self.reused += delta[0]
+            self.pruned += delta[1]
+            self.extracted += delta[2]
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def prune(self, folder: str, recursive: bool) -> None:
+        """Drop entries under *folder* that were not seen during a complete walk."""
+
+        root = os.path.abspath(folder)
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\U0010ffff"),
+            ).fetchall()
+            stale = [
+                (path,)
+                for (path,) in rows
+                if path not in self._seen
+                and (recursive or os.path.dirname(path) == root)
+            ]
+            if stale:
+                self._conn.executemany("DELETE FROM blocks WHERE path = ?", stale)
+                self._conn.executemany("DELETE FROM files WHERE path = ?", stale)
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+
+
+def configure_content_index(directory: str) -> None:
+    global CONTENT_INDEX
+    close_content_index()
+    if not directory:
+        return
+    try:
+        CONTENT_INDEX = ContentIndex(directory)
+    except (OSError, sqlite3.Error) as exc:
+        warn_once("index:open", f"インデックスを開けませんでした: {directory} ({exc})")
+        CONTENT_INDEX = None
+
+
+def close_content_index() -> None:
+    global CONTENT_INDEX
+    index = CONTENT_INDEX
+    if index is not None:
+        CONTENT_INDEX = None
+        try:
+            index.close()
+        except sqlite3.Error as exc:
+            warn_once("index:close", f"インデックスの保存に失敗しました: {exc}")
+
+
+EXTRACT_CACHE_FILE_NAME = "fastfilefinder-extract.sqlite3"
+# 2: .xls entries moved from per-cell "xls" to per-row "xls:rows" records.
+EXTRACT_CACHE_SCHEMA_VERSION = 2
+# Opt-in: nothing is written to the profile unless --cache-size is given.
+EXTRACT_CACHE_DEFAULT_MB = 0
+EXTRACT_CACHE_HASH_CHUNK = 1 << 20
+# Eviction trims to this share of the cap so it does not run on every store.
+EXTRACT_CACHE_EVICT_RATIO = 0.9
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "FastFileFinder")
+
+
+class ExtractCache:
+    """Size-capped LRU store of text extracted by the slow converters.
+
+    Entries are keyed by kind plus path, size and mtime, or by kind plus a
+    SHA-1 of the file contents when ``content_hash`` is set, so copies and
+    renamed files are recognised too. Unlike :class:`ContentIndex` it is
+    size-capped and only holds formats whose extraction is expensive.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, content_hash: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, EXTRACT_CACHE_FILE_NAME),
+            timeout=INDEX_BUSY_TIMEOUT,
+            check_same_thread=False,
+        )
+        self._max_bytes = max_bytes
+        self._content_hash = content_hash
+        self._pending = 0
+        self.hits = 0
+        self.stored = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != EXTRACT_CACHE_SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS extracts")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extracts ("
+                " key TEXT PRIMARY KEY,"
+                " bytes INTEGER NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " records BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS extracts_lru ON extracts (last_used)")
+            self._conn.execute(f"PRAGMA user_version={EXTRACT_CACHE_SCHEMA_VERSION}")
+            self._conn.commit()
+            self._total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM extracts").fetchone()[0]
+
+    def _key(self, path: str, kind: str) -> Optional[str]:
+        try:
+            if not self._content_hash:
+                st = os.stat(path)
+                return f"{kind}\0{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}"
+            digest = hashlib.sha1()
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(EXTRACT_CACHE_HASH_CHUNK), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return f"{kind}\0sha1:{digest.hexdigest()}"
+
+    def _commit_if_due(self) -> None:
+        self._pending += 1
+        if self._pending >= INDEX_COMMIT_INTERVAL:
+            self._conn.commit()
+            self._pending = 0
+
+    def _load(self, key: str) -> Optional[List[tuple]]:
+        with self._lock:
+            row = self._conn.execute("SELECT records FROM extracts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE extracts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._commit_if_due()
+            self.hits += 1
+        try:
+            return _decode_records(row[0])
+        except Exception:
+            return None
+
+    def _store(self, key: str, records: List[tuple]) -> None:
+        blob = _encode_records(records)
+        if len(blob) > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._conn.execute("SELECT bytes FROM extracts WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extracts (key, bytes, last_used, records) VALUES (?, ?, ?, ?)",
+                (key, len(blob), time.time(), blob),
+            )
+            self._total += len(blob) - (previous[0] if previous else 0)
+            self.stored += 1
+            if self._total > self._max_bytes:
+                self._evict()
+            self._commit_if_due()
+
+    def _evict(self) -> None:
+        # Other processes may share the file, so start from the real total.
+        self._total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM extracts").fetchone()[0]
+        target = int(self._max_bytes * EXTRACT_CACHE_EVICT_RATIO)
+        if self._total <= self._max_bytes:
+            return
+        stale = []
+        for key, size in self._conn.execute("SELECT key, bytes FROM extracts ORDER BY last_used"):
+            if self._total <= target:
+                break
+            stale.append((key,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM extracts WHERE key = ?", stale)
+
+    def records(self, path: str, kind: str, extract):
+        """Yield the records of *path*, running ``extract(path)`` only on a miss.
+
+        On a miss each record is passed on as soon as it is extracted. The
+        entry is stored only when the extractor runs to the end, so a
+        consumer that stops early (``--perfile``) or an extraction error
+        leaves nothing behind, and collecting stops once the entry could not
+        fit in the cache.
+        """
+
+        key = self._key(path, kind)
+        if key is not None:
+            cached = self._load(key)
+            if cached is not None:
+                yield from cached
+                return
+        collected: Optional[List[tuple]] = [] if key is not None else None
+        size = 0
+        records = extract(path)
+        try:
+            for record in records:
+                record = tuple(record)
+                if collected is not None:
+                    size += _record_size(record)
+                    if size > self._max_bytes:
+                        collected = None
+                    else:
+                        collected.append(record)
+                yield record
+        finally:
+            close = getattr(records, "close", None)
+            if close is not None:
+                close()
+        if collected is not None:
+            try:
+                self._store(key, collected)
+            except sqlite3.Error as exc:
+                warn_once("cache:write", f"抽出キャッシュへの書き込みに失敗しました: {exc}")
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+
 
+def cached_records(path: str, kind: str, extract):
+    """Records of *path* from ``extract(path)``, through the extract cache when enabled."""
 
-def _convert_doc_via_antiword(path: str) -> List[str]:
-    antiword = _find_antiword_executable()
-    if not antiword:
-        raise DocConversionError("antiword-not-found", "antiword が PATH 上に見つかりません")
+    cache = EXTRACT_CACHE
+    if cache is None:
+        return extract(path)
+    return cache.records(path, kind, extract)
 
-    commands = [
-        [antiword, "-m", "UTF-8.txt", os.path.abspath(path)],
-        [antiword, os.path.abspath(path)],
-    ]
-    last_failure: Optional[subprocess.CompletedProcess] = None
-    for command in commands:
+
+def configure_extract_cache(directory: str, size_mb: int, content_hash: bool = False) -> None:
+    global EXTRACT_CACHE
+    close_extract_cache()
+    if size_mb <= 0:
+        return
+    directory = directory or default_cache_dir()
+    try:
+        EXTRACT_CACHE = ExtractCache(directory, size_mb * 1024 * 1024, content_hash)
+    except (OSError, sqlite3.Error) as exc:
+        warn_once("cache:open", f"抽出キャッシュを開けませんでした: {directory} ({exc})")
+        EXTRACT_CACHE = None
+
+
+def close_extract_cache() -> None:
+    global EXTRACT_CACHE
+    cache = EXTRACT_CACHE
+    if cache is not None:
+        EXTRACT_CACHE = None
         try:
-            completed = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
+            cache.close()
+        except sqlite3.Error as exc:
+            warn_once("cache:close", f"抽出キャッシュの保存に失敗しました: {exc}")
+
+
+RESULT_CACHE_FILE_NAME = "fastfilefinder-results.sqlite3"
+RESULT_CACHE_SCHEMA_VERSION = 1
+# Opt-in like the extract cache: only used when --result-cache-size is given.
+RESULT_CACHE_DEFAULT_MB = 0
+# Options that change which lines a search reports; the rest (engine, worker
+# counts, --spans, cache and index locations) only change how it runs.
+RESULT_CACHE_KEY_OPTIONS = (
+    "recursive",
+    "perfile",
+    "zip",
+    "zip_depth",
+    "zip_max_mb",
+    "zip_max_ratio",
+    "word",
+    "excel",
+    "excel_numbers",
+    "pdf",
+    "word_legacy",
+    "excel_legacy",
+    "legacy_doc",
+)
+# Rough per-row overhead added to the stored hit bytes when sizing a query.
+RESULT_CACHE_ROW_BYTES = 64
+
+
+def result_cache_key(args, matcher, exts: set, excluded: set) -> str:
+    spec = {name: getattr(args, name) for name in RESULT_CACHE_KEY_OPTIONS}
+    spec.update(
+        folder=os.path.normcase(os.path.abspath(args.folder)),
+        exts=sorted(exts),
+        excluded=sorted(excluded),
+        patterns=matcher.patterns,
+        regex=matcher.use_regex,
+        all=matcher.require_all,
+    )
+    payload = json.dumps(spec, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Hits of earlier runs of the same search, with the file snapshot they came from.
+
+    Each completed search is stored under a key built from the folder, the
+    result-affecting options and the patterns, one row per scanned file with
+    its size, mtime and hits. A repeat search replays the rows of files whose
+    size and mtime are unchanged and rescans only the rest. The new snapshot
+    is staged under a private key and replaces the old one only when the
+    search completes. Whole queries are evicted least recently used first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, query: str):
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, RESULT_CACHE_FILE_NAME),
+            timeout=INDEX_BUSY_TIMEOUT,
+            check_same_thread=False,
+        )
+        self._max_bytes = max_bytes
+        self._query = query
+        self._staging = f"{query}~{os.getpid()}.{time.monotonic_ns()}"
+        self._bytes = 0
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != RESULT_CACHE_SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS queries")
+                self._conn.execute("DROP TABLE IF EXISTS files")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS queries ("
+                " query TEXT PRIMARY KEY,"
+                " bytes INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
             )
-        except FileNotFoundError as exc:
-            detail = f"Launch failed: {_error_text(exc)}"
-            raise DocConversionError("antiword-launch", detail)
-        except Exception as exc:
-            detail = f"Execution failed: {_error_text(exc)}"
-            raise DocConversionError("antiword-run", detail)
-        if completed.returncode == 0:
-            output = completed.stdout or ""
-            return output.replace("\r\n", "\n").splitlines()
-        last_failure = completed
-
-    if last_failure is not None:
-        message = last_failure.stderr.strip() or last_failure.stdout.strip()
-        detail = f"stderr={message}" if message else None
-        raise DocConversionError(f"antiword-exit={last_failure.returncode}", detail)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " query TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " hits INTEGER NOT NULL,"
+                " skipped INTEGER NOT NULL,"
+                " records BLOB,"
+                " PRIMARY KEY (query, path))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS queries_lru ON queries (last_used)")
+            self._conn.execute(f"PRAGMA user_version={RESULT_CACHE_SCHEMA_VERSION}")
+            # Registered like a finished query so that a staging area left by
+            # a killed run is eventually evicted.
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries (query, bytes, last_used) VALUES (?, 0, ?)",
+                (self._staging, time.time()),
+            )
+            self._snapshot = {
+                path: (size, mtime_ns, hits, skipped)
+                for path, size, mtime_ns, hits, skipped in self._conn.execute(
+                    "SELECT path, size, mtime_ns, hits, skipped FROM files WHERE query = ?",
+                    (query,),
+                )
+            }
+            self._conn.commit()
 
-    raise DocConversionError("antiword", "antiword での変換に失敗しました")
+    def _commit_if_due(self) -> None:
+        self._pending += 1
+        if self._pending >= INDEX_COMMIT_INTERVAL:
+            self._conn.commit()
+            self._pending = 0
 
+    def lookup(self, path: str, dir_entry: Optional[os.DirEntry] = None):
+        """Return ``(signature, cached)`` for *path*.
 
-def iter_doc_legacy_lines(path: str, mode: str) -> Iterable[str]:
-    converters = []
-    normalized_mode = (mode or "").lower()
-    if normalized_mode in {"com", "auto"}:
-        converters.append(_convert_doc_via_com)
-    if normalized_mode in {"auto", "external"}:
-        converters.append(_convert_doc_via_soffice)
-        converters.append(_convert_doc_via_antiword)
+        ``cached`` is ``(hits, records, skipped)`` when the file is unchanged
+        since the stored run, else ``None``; ``signature`` is passed back to
+        :meth:`store` after a rescan (``None`` when the file cannot be stat'ed).
+        """
 
-    for converter in converters:
         try:
-            if converter is _convert_doc_via_com:
-                global DOC_WORKER_POOL
-                if DOC_WORKER_POOL is None:
-                    configure_doc_workers(DOC_DIAG_CONTEXT.get("single_thread", False))
-                lines = DOC_WORKER_POOL.run(converter, path)
-            else:
-                lines = converter(path)
-        except DocConversionError as exc:
-            _log_doc_error(exc.stage, path, exc.detail)
-            continue
-        except Exception as exc:  # pragma: no cover - unexpected path
-            _log_doc_error("unexpected", path, str(exc))
-            continue
-
-        for line in lines:
-            yield line
-        return
+            st = dir_entry.stat() if dir_entry is not None else os.stat(path)
+        except OSError:
+            return None, None
+        signature = (st.st_size, st.st_mtime_ns)
+        known = self._snapshot.get(path)
+        with self._lock:
+            if known is None or known[:2] != signature:
+                self.misses += 1
+                return signature, None
+            hits, skipped = known[2:]
+            blob = None
+            if hits:
+                row = self._conn.execute(
+                    "SELECT records FROM files WHERE query = ? AND path = ?", (self._query, path)
+                ).fetchone()
+                if row is None or row[0] is None:
+                    self.misses += 1
+                    return signature, None
+                blob = row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (query, path, size, mtime_ns, hits, skipped, records)"
+                " SELECT ?, path, size, mtime_ns, hits, skipped, records FROM files"
+                " WHERE query = ? AND path = ?",
+                (self._staging, self._query, path),
+            )
+            self._bytes += len(blob or b"") + len(path) + RESULT_CACHE_ROW_BYTES
+            self._commit_if_due()
+            self.hits += 1
+        try:
+            records = _decode_records(blob) if blob is not None else []
+        except Exception:
+            return signature, None
+        return signature, (hits, records, skipped)
+
+    def store(self, path: str, signature: tuple, hits: int, records: List[tuple], skipped: int) -> None:
+        blob = _encode_records(records) if records else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (query, path, size, mtime_ns, hits, skipped, records)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._staging, path, signature[0], signature[1], hits, skipped, blob),
+            )
+            self._bytes += len(blob or b"") + len(path) + RESULT_CACHE_ROW_BYTES
+            self._commit_if_due()
 
+    def scan(self, path: str, run, dir_entry: Optional[os.DirEntry] = None) -> int:
+        """Replay the stored hits of *path*, or call ``run()`` and store what it emits."""
 
-def scan_doc_legacy(path: str, matcher, perfile: int, legacy_mode: str) -> int:
-    hits = 0
-    for lineno, line in enumerate(iter_doc_legacy_lines(path, legacy_mode), 1):
-        if matcher(line):
-            emit_tsv(path, "", lineno, line)
-            hits += 1
-            if perfile and hits >= perfile:
+        signature, cached = self.lookup(path, dir_entry)
+        if cached is not None:
+            hits, records = replay_cached_file(path, cached)
+            for entry, lineno, text in records:
+                emit_tsv(path, entry, lineno, text)
+            return hits
+        begin_file_scan(tee=True)
+        try:
+            hits = run()
+        finally:
+            records, complete, skipped = end_file_scan()
+        if complete and signature is not None:
+            try:
+                self.store(path, signature, hits, records, skipped)
+            except sqlite3.Error as exc:
+                warn_once("results:write", f"検索結果キャッシュへの書き込みに失敗しました: {exc}")
+        return hits
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM queries").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        target = int(self._max_bytes * EXTRACT_CACHE_EVICT_RATIO)
+        stale = []
+        for query, size in self._conn.execute("SELECT query, bytes FROM queries ORDER BY last_used"):
+            if total <= target:
                 break
-    _log_doc_stage("Emit", f"{path} hits={hits}")
-    return hits
+            if query != self._query:
+                stale.append((query,))
+                total -= size
+        self._conn.executemany("DELETE FROM files WHERE query = ?", stale)
+        self._conn.executemany("DELETE FROM queries WHERE query = ?", stale)
+
+    def finish(self, complete: bool) -> None:
+        """Replace the stored snapshot with this run's when *complete*, else drop it."""
+
+        with self._lock:
+            if complete and self._bytes <= self._max_bytes:
+                self._conn.execute("DELETE FROM files WHERE query = ?", (self._query,))
+                self._conn.execute("UPDATE files SET query = ? WHERE query = ?", (self._query, self._staging))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO queries (query, bytes, last_used) VALUES (?, ?, ?)",
+                    (self._query, self._bytes, time.time()),
+                )
+            else:
+                self._conn.execute("DELETE FROM files WHERE query = ?", (self._staging,))
+                if self._snapshot:
+                    self._conn.execute(
+                        "UPDATE queries SET last_used = ? WHERE query = ?", (time.time(), self._query)
+                    )
+            self._conn.execute("DELETE FROM queries WHERE query = ?", (self._staging,))
+            self._evict()
+            self._conn.commit()
+            self._pending = 0
 
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
 
-def _excel_column_name(index: int) -> str:
-    name = ""
-    i = index
-    while i >= 0:
-        i, remainder = divmod(i, 26)
-        name = chr(65 + remainder) + name
-        i -= 1
-    return name
 
+def replay_cached_file(path: str, cached: tuple) -> Tuple[int, List[tuple]]:
+    """Account for a file answered from the result cache; returns ``(hits, records)``."""
 
-def scan_xls_legacy(path: str, matcher, perfile: int) -> int:
-    if xlrd is None:
-        warn_once("xls", "xlrd<=1.2 がインストールされていないため .xls をスキップします")
-        return 0
+    hits, records, skipped = cached
+    if skipped:
+        note_skipped(skipped)
+    index = CONTENT_INDEX
+    if index is not None:
+        # Keep the file out of the index prune although it was not opened.
+        index.mark_seen(path)
+    return hits, records
 
-    try:
-        workbook = xlrd.open_workbook(path, on_demand=True)
-    except Exception as exc:
-        warn_once(f"xls:{path}", f".xls 読み込み失敗: {path} ({exc})")
-        return 0
 
-    hits = 0
+def configure_result_cache(directory: str, size_mb: int, query: str) -> None:
+    global RESULT_CACHE
+    close_result_cache()
+    if size_mb <= 0:
+        return
+    directory = directory or default_cache_dir()
     try:
-        for sheet in workbook.sheets():
-            for row_idx in range(sheet.nrows):
-                for col_idx in range(sheet.ncols):
-                    try:
-                        value = sheet.cell_value(row_idx, col_idx)
-                    except Exception:
-                        continue
-                    if value in (None, ""):
-                        continue
-                    text = str(value).strip()
-                    if not text:
-                        continue
-                    entry = f"{sheet.name}!{_excel_column_name(col_idx)}{row_idx + 1}"
-                    if matcher(text):
-                        emit_tsv(path, entry, row_idx + 1, text)
-                        hits += 1
-                        if perfile and hits >= perfile:
-                            return hits
-    finally:
+        RESULT_CACHE = ResultCache(directory, size_mb * 1024 * 1024, query)
+    except (OSError, sqlite3.Error) as exc:
+        warn_once("results:open", f"検索結果キャッシュを開けませんでした: {directory} ({exc})")
+        RESULT_CACHE = None
+
+
+def close_result_cache(complete: bool = False) -> None:
+    global RESULT_CACHE
+    cache = RESULT_CACHE
+    if cache is not None:
+        RESULT_CACHE = None
         try:
-            workbook.release_resources()
-        except Exception:
-            pass
-    return hits
+            try:
+                cache.finish(complete)
+            finally:
+                cache.close()
+        except sqlite3.Error as exc:
+            warn_once("results:close", f"検索結果キャッシュの保存に失敗しました: {exc}")
+
+
+def extractor_name(kind: str) -> str:
+    """Short extractor name (``zip``, ``gz``, ``pdf``, ``xlsx``...) of an index/cache *kind*."""
+    return kind.partition(":")[0]
 
 
-def scan_file(path: str, matcher, args, exts: set) -> int:
+def resolve_extractor(path: str, matcher, args, exts: set):
+    """Return ``(kind, scan, records)`` for *path*, or ``None`` when it is not scanned.
+
+    ``scan()`` matches and emits directly; ``records()`` yields the extracted
+    ``(lineno, entry, text)`` records used to populate the content index.
+    """
+
+    if not is_scan_target(path, args, exts):
+        return None
     ext = normalize_ext(os.path.splitext(path)[1])
     perfile = args.perfile
+    archive = stream_archive_kind(path)
+    if archive is not None:
+        return (
+            archive + ":" + ";".join(sorted(exts)),
+            lambda: scan_stream_archive(path, archive, matcher, exts, perfile),
+            lambda: iter_stream_archive_records(path, archive, exts),
+        )
     if ext == "zip":
-        if args.zip:
-            return scan_zip(path, matcher, exts, perfile)
-        return 0
-    if not should_target(path, exts):
-        return 0
+        formats = archive_formats(args)
+        return (
+            "zip:" + ";".join(sorted(exts)) + "|" + ";".join(sorted(formats.values())),
+            lambda: scan_zip(path, matcher, exts, perfile, formats),
+            lambda: iter_zip_records(path, exts, formats),
+        )
     if ext == "pdf":
         if args.pdf:
-            return scan_pdf(path, matcher, perfile)
-        return 0
+            return (
+                "pdf",
+                lambda: scan_pdf(path, matcher, perfile),
+                lambda: cached_records(path, "pdf", iter_pdf_records),
+            )
+        return None
     if ext == "docx" and args.word:
-        return scan_docx(path, matcher, perfile)
+        return (
+            "docx",
+            lambda: scan_docx(path, matcher, perfile),
+            lambda: cached_records(path, "docx", iter_docx_records),
+        )
     if ext == "xlsx" and args.excel:
-        return scan_xlsx(path, matcher, perfile)
+        numbers = args.excel_numbers
+        return (
+            "xlsx:values" if numbers else "xlsx:strings",
+            lambda: scan_xlsx(path, matcher, perfile, numbers),
+            lambda: iter_xlsx_records(path, numbers),
+        )
     if ext == "doc" and args.word_legacy:
-        return scan_doc_legacy(path, matcher, perfile, args.legacy_doc)
+        return (
+            "doc",
+            lambda: scan_doc_legacy(path, matcher, perfile, args.legacy_doc),
+            lambda: cached_records(path, "doc", lambda p: iter_doc_legacy_records(p, args.legacy_doc)),
+        )
     if ext == "xls" and args.excel_legacy:
-        return scan_xls_legacy(path, matcher, perfile)
-    return scan_text_file(path, matcher, exts, perfile)
+        return (
+            "xls",
+            lambda: scan_xls_legacy(path, matcher, perfile),
+            lambda: iter_xls_records(path),
+        )
+    if is_binary_name(path, exts):
+        note_skipped()
+        return None
+    return "text", lambda: scan_text_file(path, matcher, exts, perfile), lambda: iter_text_lines(path)
 
 
-def main() -> None:
+def _scan_resolved(path: str, kind: str, scan, records, matcher, perfile: int, dir_entry) -> int:
+    index = CONTENT_INDEX
+    if index is not None:
+        return index.scan(path, kind, records, matcher, perfile, dir_entry)
+    return scan()
+
+
+def scan_file(path: str, matcher, args, exts: set, dir_entry: Optional[os.DirEntry] = None) -> int:
+    resolved = resolve_extractor(path, matcher, args, exts)
+    if resolved is None:
+        return 0
+    kind, scan, records = resolved
+    stats = STATS
+    if stats is None:
+        return _scan_resolved(path, kind, scan, records, matcher, args.perfile, dir_entry)
+    nested = stats.wall("read", "emit")
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        return _scan_resolved(path, kind, scan, records, matcher, args.perfile, dir_entry)
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        try:
+            size = dir_entry.stat().st_size if dir_entry is not None else os.stat(path).st_size
+        except OSError:
+            size = 0
+        stats.file_done(path, extractor_name(kind), size, wall, cpu, wall - (stats.wall("read", "emit") - nested))
+
+
+PIPELINE_QUEUE_FACTOR = 4
+QUEUED_STATUS_INTERVAL = 0.25
+PROCESS_BATCH_SIZE = 16
+PROCESS_MAX_WORKERS_WINDOWS = 61
+
+_PIPELINE_END = object()
+
+
+def run_scan_pipeline(
+    items: Iterable,
+    scan_batch,
+    max_workers: int,
+    on_queued,
+    on_result,
+    batch_size: int = 1,
+    cancel: Optional[threading.Event] = None,
+) -> bool:
+    """Scan *items* on ``max_workers`` threads while they are still being enumerated.
+
+    The walker feeds a bounded queue of batches (up to ``batch_size`` items,
+    shipped early whenever the workers are idle), so memory stays flat and the
+    first hits arrive before enumeration finishes. ``scan_batch(batch)``
+    returns one result per item. ``on_queued(count, final)`` and
+    ``on_result(item, result)`` are always called on the calling thread.
+    Once *cancel* is set the walk stops and queued batches are dropped
+    unscanned. Returns ``True`` when the walk ran to completion.
+    """
+
+    cancel = cancel or threading.Event()
+
+    work: "queue.Queue" = queue.Queue(maxsize=max_workers * PIPELINE_QUEUE_FACTOR)
+    results: "queue.Queue" = queue.Queue()
+    walk_state = {"complete": False}
+
+    def produce() -> None:
+        queued = 0
+        batch: list = []
+        last_report = time.monotonic()
+        try:
+            for item in items:
+                if cancel.is_set():
+                    break
+                batch.append(item)
+                queued += 1
+                if len(batch) >= batch_size or work.empty():
+                    work.put(batch)
+                    batch = []
+                now = time.monotonic()
+                if now - last_report >= QUEUED_STATUS_INTERVAL:
+                    last_report = now
+                    results.put(("queued", queued, False))
+            walk_state["complete"] = not cancel.is_set()
+        except Exception as exc:
+            warn_once("walk", f"フォルダの列挙に失敗しました: {exc}")
+        finally:
+            if batch:
+                work.put(batch)
+            results.put(("queued", queued, True))
+            for _ in range(max_workers):
+                work.put(_PIPELINE_END)
+
+    def consume() -> None:
+        while True:
+            batch = work.get()
+            if batch is _PIPELINE_END:
+                results.put(_PIPELINE_END)
+                return
+            if not cancel.is_set():
+                results.put(("result", batch, scan_batch(batch)))
+
+    threads = [threading.Thread(target=produce, name="scan-walker", daemon=True)]
+    threads.extend(
+        threading.Thread(target=consume, name=f"scan-worker-{i}", daemon=True)
+        for i in range(max_workers)
+    )
+    for thread in threads:
+        thread.start()
+
+    running = max_workers
+    while running:
+        message = results.get()
+        if message is _PIPELINE_END:
+            running -= 1
+        elif message[0] == "queued":
+            on_queued(message[1], message[2])
+        else:
+            for item, result in zip(message[1], message[2]):
+                on_result(item, result)
+    return walk_state["complete"]
+
+
+_PROCESS_WORKER_STATE: Optional[tuple] = None
+
+
+def _init_process_worker(config: dict) -> None:
+    global _PROCESS_WORKER_STATE
+    args = config["args"]
+    configure_doc_diag(
+        args.diag,
+        args.perfile,
+        args.exts,
+        args.legacy_doc,
+        args.doc_single_thread,
+    )
+    if args.legacy_doc in {"com", "auto"}:
+        configure_doc_workers(args.doc_single_thread)
+    configure_content_index(args.index_dir)
+    configure_extract_cache(args.cache_dir, args.cache_size, args.cache_hash)
+    configure_archives(args.zip_depth, args.zip_max_mb, args.zip_max_ratio, 1)
+    configure_stats(args.stats, args.stats_slowest)
+    matcher = build_matcher(config["patterns"], args.regex, args.logic)
+    _PROCESS_WORKER_STATE = (matcher, args, config["exts"])
+    multiprocessing.util.Finalize(None, _shutdown_process_worker, exitpriority=10)
+
+
+def _shutdown_process_worker() -> None:
+    shutdown_doc_workers()
+    close_content_index()
+    close_extract_cache()
+    if _PROCESS_WORKER_STATE is not None and _PROCESS_WORKER_STATE[1].diag:
+        _emit_import_diag()
+
+
+def _process_scan_batch(paths: List[str]):
+    """Scan *paths* inside a pool process; returns per-file ``(hits, records, complete, skipped)``."""
+
+    global EMIT_CAPTURE
+    matcher, args, exts = _PROCESS_WORKER_STATE
+    index = CONTENT_INDEX
+    before = index.counts() if index is not None else None
+    skipped_before = SKIPPED_FILES
+    results = []
+    for path in paths:
+        captured: list = []
+        EMIT_CAPTURE = captured
+        begin_file_scan(tee=False)
+        try:
+            hits = scan_file(path, matcher, args, exts)
+        except Exception as exc:  # pragma: no cover - unexpected
+            warn_once(f"file:{path}", f"処理失敗: {path} ({exc})")
+            hits = 0
+            note_incomplete()
+        finally:
+            EMIT_CAPTURE = None
+            _, complete, skipped = end_file_scan()
+        results.append((hits, captured, complete, skipped))
+    index_delta = None
+    if index is not None:
+        index.flush()
+        index_delta = tuple(after - prior for after, prior in zip(index.counts(), before))
+    if EXTRACT_CACHE is not None:
+        EXTRACT_CACHE.flush()
+    stats = STATS.drain() if STATS is not None else None
+    return results, index_delta, SKIPPED_FILES - skipped_before, stats
+
+
+def create_process_pool(max_workers: int, config: dict) -> ProcessPoolExecutor:
+    if os.name == "nt":
+        max_workers = min(max_workers, PROCESS_MAX_WORKERS_WINDOWS)
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_process_worker,
+        initargs=(config,),
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--folder", required=True)
-    ap.add_argument("--query", required=True)
+    ap.add_argument("--folder", default="")
+    ap.add_argument("--query", default="")
     ap.add_argument("--query2", default="")
+    ap.add_argument("--query-file", default="")
     ap.add_argument("--logic", choices=["and", "or"], default="and")
     ap.add_argument("--regex", action="store_true")
     ap.add_argument("--zip", action="store_true")
+    ap.add_argument("--zip-depth", type=int, default=ARCHIVE_MAX_DEPTH)
+    ap.add_argument("--zip-max-mb", type=int, default=ARCHIVE_MAX_BYTES // (1024 * 1024))
+    ap.add_argument("--zip-max-ratio", type=int, default=ARCHIVE_MAX_RATIO)
     ap.add_argument("--recursive", action="store_true")
     ap.add_argument("--exts", default="")
     ap.add_argument("--perfile", type=int, default=0)
     ap.add_argument("--word", action="store_true")
     ap.add_argument("--excel", action="store_true")
+    ap.add_argument("--excel-numbers", action="store_true")
     ap.add_argument("--pdf", action="store_true")
     ap.add_argument("--word-legacy", action="store_true")
     ap.add_argument("--excel-legacy", action="store_true")
@@ -1183,10 +4421,26 @@ def main() -> None:
     ap.add_argument("--legacy-doc", choices=["auto", "com", "external"], default="com")
     ap.add_argument("--doc-single-thread", action="store_true")
     ap.add_argument("--max-workers", type=int, default=0)
+    ap.add_argument("--engine", choices=["thread", "process"], default="thread")
+    ap.add_argument("--walk-workers", type=int, default=0)
+    ap.add_argument("--pdf-workers", type=int, default=0)
     ap.add_argument("--exclude-folders", default="")
     ap.add_argument("--diag", action="store_true")
-    args = ap.parse_args()
-
+    ap.add_argument("--index-dir", default="")
+    ap.add_argument("--cache-dir", default="")
+    ap.add_argument("--cache-size", type=int, default=EXTRACT_CACHE_DEFAULT_MB)
+    ap.add_argument("--cache-hash", action="store_true")
+    ap.add_argument("--result-cache-size", type=int, default=RESULT_CACHE_DEFAULT_MB)
+    ap.add_argument("--status-interval", type=int, default=STATUS_INTERVAL_DEFAULT_MS)
+    ap.add_argument("--spans", action="store_true")
+    ap.add_argument("--within", default="")
+    ap.add_argument("--stats", action="store_true")
+    ap.add_argument("--stats-slowest", type=int, default=STATS_SLOWEST_DEFAULT)
+    ap.add_argument("--serve", action="store_true")
+    return ap
+
+
+def normalize_args(args) -> None:
     args.legacy_doc = (args.legacy_doc or "com").lower()
 
     if getattr(args, "legacy", False):
@@ -1196,11 +4450,40 @@ def main() -> None:
     if args.perfile is None or args.perfile < 0:
         args.perfile = 0
 
-    if args.diag:
-        _emit_startup_diag(args.perfile, args.exts, args.legacy_doc, args.doc_single_thread)
-    elif args.exts:
-        sys.stderr.write(f"diag: exts={args.exts}\n")
-        sys.stderr.flush()
+
+def _report_error(message: str, tag: str = "") -> None:
+    sys.stderr.write(message + "\n")
+    sys.stderr.flush()
+    if tag:
+        _write_stdout(f"{tag}#error\t{message}")
+
+
+def _write_stdout(line: str) -> None:
+    with stdout_lock:
+        try:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        except (OSError, ValueError):
+            pass
+
+
+def run_search(
+    args,
+    cancel: Optional[threading.Event] = None,
+    tag: str = "",
+    candidates: Optional[List[str]] = None,
+) -> Optional[List[str]]:
+    """Run one search described by *args*, writing TSV/status lines prefixed with *tag*.
+
+    Setting *cancel* stops the walk and skips files not yet started; the run
+    then ends with ``#cancelled`` instead of ``#done``. With *candidates* (or
+    ``--within``) only those files are scanned and the folder is not walked.
+    Returns the files with hits once the search is done, else ``None``.
+    """
+
+    global SKIPPED_FILES
+    with SKIPPED_LOCK:
+        SKIPPED_FILES = 0
 
     configure_doc_diag(
         args.diag,
@@ -1210,7 +4493,7 @@ def main() -> None:
         args.doc_single_thread,
     )
 
-    if args.legacy_doc in {"com", "auto"}:
+    if args.legacy_doc in {"com", "auto"} and args.engine == "thread":
         configure_doc_workers(args.doc_single_thread)
     else:
         shutdown_doc_workers()
@@ -1230,61 +4513,324 @@ def main() -> None:
     patterns = [args.query]
     if args.query2:
         patterns.append(args.query2)
+    if args.query_file:
+        try:
+            patterns.extend(read_query_file(args.query_file))
+        except OSError as exc:
+            _report_error(f"検索語ファイルを読み込めません: {args.query_file} ({exc})", tag)
+            return
 
     try:
         matcher = build_matcher(patterns, args.regex, args.logic)
     except re.error as exc:
-        sys.stderr.write(f"正規表現エラー: {exc}\n")
-        sys.stderr.flush()
+        _report_error(f"正規表現エラー: {exc}", tag)
         return
     except ValueError:
-        sys.stderr.write("検索キーワードが指定されていません\n")
-        sys.stderr.flush()
+        _report_error("検索キーワードが指定されていません", tag)
         return
 
-    files = list(iter_paths(args.folder, args.recursive, exclude_filter))
-    emit_status("queued", len(files))
+    if candidates is None and args.within:
+        try:
+            candidates = read_result_paths(args.within)
+        except OSError as exc:
+            _report_error(f"絞り込み元の結果を読み込めません: {args.within} ({exc})", tag)
+            return
+
+    configure_content_index(args.index_dir)
+    if args.engine == "thread":
+        configure_extract_cache(args.cache_dir, args.cache_size, args.cache_hash)
+    if candidates is None:
+        configure_result_cache(
+            args.cache_dir,
+            args.result_cache_size,
+            result_cache_key(args, matcher, ext_filter, exclude_filter),
+        )
+    configure_output(args.status_interval, matcher if args.spans else None, tag)
+    configure_stats(args.stats, args.stats_slowest)
 
     max_workers = args.max_workers if args.max_workers > 0 else (os.cpu_count() or 4)
     max_workers = max(1, max_workers)
+    if args.engine == "thread" and args.pdf:
+        configure_pdf_pages(args.pdf_workers if args.pdf_workers > 0 else max_workers)
+    configure_archives(
+        args.zip_depth,
+        args.zip_max_mb,
+        args.zip_max_ratio,
+        max_workers if args.engine == "thread" else 1,
+    )
     processed = 0
     total_hits = 0
+    hit_paths: List[str] = []
     start = time.time()
+    next_stats = time.monotonic() + STATS_INTERVAL
 
-    def worker(p: str):
+    walk_workers = args.walk_workers if args.walk_workers > 0 else WALK_DEFAULT_THREADS
+    process_pool: Optional[ProcessPoolExecutor] = None
+    # Listings reused from the walk cache carry stat data from an earlier search.
+    fresh_entries = WALK_CACHE is None
+
+    def worker(entry: os.DirEntry) -> int:
+        p = entry.path
         emit_status("current", p)
+        dir_entry = entry if fresh_entries else None
         try:
-            return p, scan_file(p, matcher, args, ext_filter)
+            cache = RESULT_CACHE
+            if cache is not None:
+                return cache.scan(p, lambda: scan_file(p, matcher, args, ext_filter, dir_entry), dir_entry)
+            return scan_file(p, matcher, args, ext_filter, dir_entry)
         except Exception as exc:  # pragma: no cover - unexpected
             warn_once(f"file:{p}", f"処理失敗: {p} ({exc})")
-            return p, 0
+            return 0
+
+    def scan_batch_in_threads(batch: List[os.DirEntry]) -> List[int]:
+        return [worker(entry) for entry in batch]
+
+    def scan_batch_in_processes(batch: List[os.DirEntry]) -> List[Tuple[int, list]]:
+        cache = RESULT_CACHE
+        results: List[Optional[Tuple[int, list]]] = [None] * len(batch)
+        signatures = {}
+        if cache is not None:
+            for i, entry in enumerate(batch):
+                signature, cached = cache.lookup(entry.path, entry if fresh_entries else None)
+                if cached is not None:
+                    results[i] = replay_cached_file(entry.path, cached)
+                else:
+                    signatures[i] = signature
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        paths = [batch[i].path for i in pending]
+        index = CONTENT_INDEX
+        if index is not None:
+            for p in paths:
+                index.mark_seen(p)
+        try:
+            scanned, index_delta, skipped, stats = process_pool.submit(_process_scan_batch, paths).result()
+        except Exception as exc:
+            warn_once(f"batch:{paths[0]}", f"処理中に例外: {paths[0]} ほか {len(paths)} 件 ({exc})")
+            scanned, index_delta, skipped, stats = [(0, [], False, 0)] * len(paths), None, 0, None
+        if stats is not None and STATS is not None:
+            STATS.merge(stats)
+        if index is not None and index_delta is not None:
+            index.add_counts(index_delta)
+        if skipped:
+            note_skipped(skipped)
+        for i, (hits, records, complete, file_skipped) in zip(pending, scanned):
+            results[i] = (hits, records)
+            signature = signatures.get(i)
+            if complete and signature is not None:
+                try:
+                    cache.store(batch[i].path, signature, hits, records, file_skipped)
+                except sqlite3.Error as exc:
+                    warn_once("results:write", f"検索結果キャッシュへの書き込みに失敗しました: {exc}")
+        return results
+
+    def on_queued(count: int, final: bool) -> None:
+        emit_status("queued", count)
+
+    def on_result(entry: os.DirEntry, result) -> None:
+        nonlocal processed, total_hits, next_stats
+        if process_pool is not None:
+            hits, records = result
+            for entry_name, lineno, line in records:
+                emit_tsv(entry.path, entry_name, lineno, line)
+        else:
+            hits = result
+        processed += 1
+        total_hits += hits
+        if hits:
+            hit_paths.append(entry.path)
+        emit_status("progress", processed, total_hits, entry.path)
+        if STATS is not None and time.monotonic() >= next_stats:
+            next_stats = time.monotonic() + STATS_INTERVAL
+            emit_stats()
 
     try:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(worker, p): p for p in files}
-            for fut in as_completed(futures):
-                path = futures[fut]
-                try:
-                    _, hits = fut.result()
-                except Exception as exc:  # pragma: no cover - already handled
-                    warn_once(f"future:{path}", f"処理中に例外: {path} ({exc})")
-                    hits = 0
-                processed += 1
-                total_hits += hits
-                emit_status("progress", processed, total_hits, path)
+        if args.engine == "process":
+            process_pool = create_process_pool(
+                max_workers,
+                {"args": args, "patterns": matcher.patterns, "exts": ext_filter},
+            )
+            scan_batch, batch_size = scan_batch_in_processes, PROCESS_BATCH_SIZE
+        else:
+            scan_batch, batch_size = scan_batch_in_threads, 1
+
+        def accept(name: str) -> bool:
+            return is_scan_target(name, args, ext_filter)
+
+        if candidates is not None:
+            items = iter_candidate_entries(candidates, accept)
+        else:
+            items = walk_entries(args.folder, args.recursive, exclude_filter, accept, walk_workers)
+        walk_complete = run_scan_pipeline(
+            items,
+            scan_batch,
+            max_workers,
+            on_queued,
+            on_result,
+            batch_size,
+            cancel,
+        )
+
+        if CONTENT_INDEX is not None:
+            if walk_complete and candidates is None:
+                CONTENT_INDEX.prune(args.folder, args.recursive)
+            if args.diag:
+                sys.stderr.write(
+                    f"diag: index reused={CONTENT_INDEX.reused}, pruned={CONTENT_INDEX.pruned}, "
+                    f"extracted={CONTENT_INDEX.extracted}\n"
+                )
+                sys.stderr.flush()
+        if args.diag and process_pool is None:
+            _emit_import_diag()
+        if args.diag and EXTRACT_CACHE is not None:
+            sys.stderr.write(f"diag: extract-cache hits={EXTRACT_CACHE.hits}, stored={EXTRACT_CACHE.stored}\n")
+            sys.stderr.flush()
 
         elapsed = time.time() - start
-        emit_status("done", processed, total_hits, f"{elapsed:.3f}")
+        emit_stats(final=True)
+        if SKIPPED_FILES:
+            emit_status("skipped", SKIPPED_FILES)
+        final = "cancelled" if cancel is not None and cancel.is_set() else "done"
+        if RESULT_CACHE is not None:
+            emit_status("cache", RESULT_CACHE.hits, RESULT_CACHE.misses)
+            close_result_cache(walk_complete and final == "done")
+        emit_status(final, processed, total_hits, f"{elapsed:.3f}")
+        return hit_paths if final == "done" else None
     finally:
-        shutdown_doc_workers()
-        try:
-            sys.stdout.flush()
-        except Exception:
-            pass
-        try:
-            sys.stderr.flush()
-        except Exception:
-            pass
+        if process_pool is not None:
+            process_pool.shutdown(wait=True)
+        close_result_cache()
+        close_content_index()
+        close_extract_cache()
+        close_output()
+        configure_stats(False)
+
+
+def _shutdown_workers() -> None:
+    shutdown_doc_workers()
+    shutdown_pdf_pages()
+    shutdown_archives()
+    try:
+        sys.stdout.flush()
+    except Exception:
+        pass
+    try:
+        sys.stderr.flush()
+    except Exception:
+        pass
+
+
+SERVE_SESSION_LIMIT = 16
+
+
+def serve(parser: argparse.ArgumentParser) -> None:
+    """Answer JSON-line requests on stdin with one long-lived process (--serve).
+
+    ``{"op": "search", "id": "7", "args": ["--folder", "C:\\logs", "--query", "abc"]}``
+    starts a search (cancelling the running one); every output line of it is
+    prefixed with ``7<TAB>``. ``{"op": "cancel"}`` stops the running search
+    and ``{"op": "exit"}`` ends the process. Word sessions, PDF/archive pools,
+    detected encodings and directory listings stay warm between searches.
+    A search request with ``"within": "7"`` only rescans the files that had
+    hits in the finished search ``7``.
+    """
+
+    configure_walk_cache()
+    current: Optional[Tuple[str, threading.Thread, threading.Event]] = None
+    # Files with hits of the last finished searches, for "within" requests.
+    sessions: OrderedDict = OrderedDict()
+    sessions_lock = threading.Lock()
+
+    def run_session(args, cancel: threading.Event, tag: str, request_id: str, candidates) -> None:
+        hit_paths = run_search(args, cancel, tag, candidates)
+        if hit_paths is not None and request_id:
+            with sessions_lock:
+                sessions[request_id] = hit_paths
+                sessions.move_to_end(request_id)
+                while len(sessions) > SERVE_SESSION_LIMIT:
+                    sessions.popitem(last=False)
+
+    def stop_current() -> None:
+        nonlocal current
+        if current is not None:
+            current[2].set()
+            current[1].join()
+            current = None
+
+    _write_stdout("#ready")
+    try:
+        for raw_line in sys.stdin:
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                request = json.loads(raw_line)
+                op = request.get("op", "")
+                request_id = str(request.get("id", ""))
+            except (ValueError, AttributeError):
+                _report_error(f"要求を解釈できません: {raw_line}", "\t")
+                continue
+            tag = request_id + "\t"
+            if op == "search":
+                stop_current()
+                try:
+                    args = parser.parse_args([str(arg) for arg in request.get("args", [])])
+                except SystemExit:
+                    _report_error("検索の引数が正しくありません", tag)
+                    continue
+                normalize_args(args)
+                candidates = None
+                within = request.get("within")
+                if within is not None:
+                    with sessions_lock:
+                        candidates = sessions.get(str(within))
+                    if candidates is None:
+                        _report_error(f"絞り込み元の検索結果がありません: {within}", tag)
+                        continue
+                elif not args.folder and not args.within:
+                    _report_error("--folder が指定されていません", tag)
+                    continue
+                cancel = threading.Event()
+                thread = threading.Thread(
+                    target=run_session,
+                    args=(args, cancel, tag, request_id, candidates),
+                    name=f"search-{request_id}",
+                    daemon=True,
+                )
+                current = (request_id, thread, cancel)
+                thread.start()
+            elif op == "cancel":
+                if current is not None and (not request_id or request_id == current[0]):
+                    stop_current()
+            elif op == "exit":
+                break
+            else:
+                _report_error(f"不明な要求です: {op}", tag)
+    finally:
+        stop_current()
+
+
+def main() -> None:
+    ap = build_parser()
+    args = ap.parse_args()
+    normalize_args(args)
+    if not args.serve and not args.folder and not args.within:
+        ap.error("--folder or --within is required")
+
+    if args.diag:
+        _emit_startup_diag(args.perfile, args.exts, args.legacy_doc, args.doc_single_thread)
+    elif args.exts:
+        sys.stderr.write(f"diag: exts={args.exts}\n")
+        sys.stderr.flush()
+
+    try:
+        if args.serve:
+            serve(ap)
+        else:
+            run_search(args)
+    finally:
+        _shutdown_workers()
 
 
 if __name__ == "__main__":
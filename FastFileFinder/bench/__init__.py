@@ -0,0 +1,7 @@
+"""End-to-end benchmarks for fastfilefinder_scan.py.
+
+``python -m bench`` generates a deterministic corpus (see :mod:`bench.corpus`),
+runs the scanner over it across engines and worker counts and prints the
+measurements as JSON; ``python -m bench compare old.json new.json`` compares
+two such reports.
+"""
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from .corpus import ensure_corpus, TREE_NAME
+from .runner import compare_reports, run_benchmarks
+
+
+def _split(value: str) -> list:
+    return [item.strip() for item in value.replace(";", ",").split(",") if item.strip()]
+
+
+def _log(message: str) -> None:
+    sys.stderr.write(message + "\n")
+    sys.stderr.flush()
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        ap = argparse.ArgumentParser(prog="python -m bench compare")
+        ap.add_argument("old")
+        ap.add_argument("new")
+        args = ap.parse_args(sys.argv[2:])
+        reports = []
+        for path in (args.old, args.new):
+            with open(path, "r", encoding="utf-8") as handle:
+                reports.append(json.load(handle))
+        for line in compare_reports(*reports):
+            print(line)
+        return
+
+    ap = argparse.ArgumentParser(prog="python -m bench")
+    ap.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "fastfilefinder-bench"))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--modes", default="inprocess,subprocess")
+    ap.add_argument("--engines", default="thread,process")
+    ap.add_argument("--workers", default=f"1,{os.cpu_count() or 4}")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--query", default="")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args()
+
+    _log(f"コーパスを準備しています: {args.corpus}")
+    manifest = ensure_corpus(args.corpus, args.seed, args.scale)
+    _log(f"{manifest['files']} ファイル, {manifest['bytes'] / (1024 * 1024):.1f} MB")
+    report = run_benchmarks(
+        manifest,
+        os.path.join(args.corpus, TREE_NAME),
+        _split(args.modes),
+        _split(args.engines),
+        [int(count) for count in _split(args.workers)],
+        args.repeat,
+        args.query or None,
+        _log,
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
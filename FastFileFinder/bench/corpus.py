@@ -0,0 +1,340 @@
+"""Deterministic synthetic corpora for the benchmarks.
+
+The same ``(seed, scale)`` always produces the same files: text in UTF-8,
+UTF-8 with BOM, UTF-16 (with and without BOM) and CP932 spread over a deep
+directory tree, a few large logs, binaries, ZIP (with nested ZIP), tar.gz
+and .gz archives, and .docx/.xlsx/.pdf documents written without any
+third-party package. About ``NEEDLE_RATE`` of all lines contain ``NEEDLE``
+(Japanese lines contain ``NEEDLE_JA``), so every run has hits spread over
+the whole tree.
+"""
+
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import tarfile
+import zipfile
+from typing import List
+from xml.sax.saxutils import escape
+
+CORPUS_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+TREE_NAME = "tree"
+
+NEEDLE = "needle"
+NEEDLE_JA = "検索対象"
+NEEDLE_RATE = 0.002
+
+TREE_DEPTH = 8
+TREE_FANOUT = 2
+
+_WORDS = (
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "request", "response",
+    "session", "user", "timeout", "retry", "error", "warning", "info", "debug",
+    "value", "config", "server", "client", "queue", "worker", "cache", "index",
+)
+_WORDS_JA = (
+    "設定", "処理", "完了", "失敗", "接続", "要求", "応答", "顧客",
+    "注文", "在庫", "確認", "更新", "削除", "登録", "検索", "結果",
+)
+# (codec, extension, share of Japanese lines) for the text files, used in turn.
+# The BOM-less UTF-16 .dat files are all Japanese, so their NULs are sparse
+# and they must still not be taken for binaries.
+_TEXT_FLAVOURS = (
+    ("utf-8", "txt", 0.0),
+    ("utf-8", "log", 0.0),
+    ("utf-8-sig", "csv", 0.0),
+    ("utf-16", "txt", 0.7),
+    ("cp932", "txt", 0.7),
+    ("utf-8", "md", 0.7),
+    ("utf-16-le", "dat", 1.0),
+)
+_ZIP_DATE = (2020, 1, 1, 0, 0, 0)
+_TAR_MTIME = 1577836800
+
+_W_MAIN = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_X_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_PKG_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_DOC_RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_CONTENT_TYPES = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+
+class _Writer:
+    def __init__(self, root: str, seed: int):
+        self.root = root
+        self.rng = random.Random(seed)
+        self.kinds: dict = {}
+        self.files = 0
+        self.bytes = 0
+
+    def write(self, relpath: str, data: bytes, kind: str) -> None:
+        path = os.path.join(self.root, *relpath.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(data)
+        counts = self.kinds.setdefault(kind, {"files": 0, "bytes": 0})
+        counts["files"] += 1
+        counts["bytes"] += len(data)
+        self.files += 1
+        self.bytes += len(data)
+
+    def line(self, japanese: bool = False) -> str:
+        rng = self.rng
+        words = _WORDS_JA if japanese else _WORDS
+        parts = [rng.choice(words) for _ in range(rng.randint(4, 14))]
+        if rng.random() < NEEDLE_RATE:
+            parts.insert(rng.randrange(len(parts) + 1), NEEDLE_JA if japanese else NEEDLE)
+        if japanese:
+            return "、".join(parts) + "。"
+        return f"{rng.randint(0, 99999):05d} " + " ".join(parts)
+
+    def lines(self, count: int, japanese: float = 0.0) -> List[str]:
+        """*count* lines, a *japanese* share of them Japanese."""
+        return [self.line(japanese > 0 and self.rng.random() < japanese) for _ in range(count)]
+
+
+def _directories(depth: int, fanout: int) -> List[str]:
+    found = [""]
+    level = [""]
+    for _ in range(depth):
+        level = [f"{parent}d{i}/" for parent in level for i in range(fanout)]
+        found.extend(level)
+    return found
+
+
+def _zip_bytes(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, data)
+    return buffer.getvalue()
+
+
+def _tar_gz_bytes(members) -> bytes:
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode="w") as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = _TAR_MTIME
+            tf.addfile(info, io.BytesIO(data))
+    return gzip.compress(raw.getvalue(), mtime=0)
+
+
+def _docx_bytes(lines: List[str]) -> bytes:
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>' for line in lines
+    )
+    return _zip_bytes(
+        [
+            (
+                "[Content_Types].xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><Types xmlns="{_CONTENT_TYPES}">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/word/document.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>',
+            ),
+            (
+                "_rels/.rels",
+                f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_PKG_RELS}">'
+                f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="word/document.xml"/>'
+                "</Relationships>",
+            ),
+            (
+                "word/document.xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{_W_MAIN}">'
+                f"<w:body>{paragraphs}</w:body></w:document>",
+            ),
+        ]
+    )
+
+
+def _xlsx_bytes(rows: List[List[str]]) -> bytes:
+    strings: List[str] = []
+    sheet_rows = []
+    for r, row in enumerate(rows, 1):
+        cells = []
+        for c, text in enumerate(row):
+            ref = f"{chr(ord('A') + c)}{r}"
+            cells.append(f'<c r="{ref}" t="s"><v>{len(strings)}</v></c>')
+            strings.append(text)
+        cells.append(f'<c r="{chr(ord("A") + len(row))}{r}"><v>{r * 1.5}</v></c>')
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    shared = "".join(f"<si><t>{escape(text)}</t></si>" for text in strings)
+    return _zip_bytes(
+        [
+            (
+                "[Content_Types].xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><Types xmlns="{_CONTENT_TYPES}">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                '<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>',
+            ),
+            (
+                "_rels/.rels",
+                f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_PKG_RELS}">'
+                f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="xl/workbook.xml"/>'
+                "</Relationships>",
+            ),
+            (
+                "xl/workbook.xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="{_X_MAIN}" xmlns:r="{_DOC_RELS}">'
+                '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>',
+            ),
+            (
+                "xl/_rels/workbook.xml.rels",
+                f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_PKG_RELS}">'
+                f'<Relationship Id="rId1" Type="{_DOC_RELS}/worksheet" Target="worksheets/sheet1.xml"/>'
+                f'<Relationship Id="rId2" Type="{_DOC_RELS}/sharedStrings" Target="sharedStrings.xml"/>'
+                "</Relationships>",
+            ),
+            (
+                "xl/sharedStrings.xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><sst xmlns="{_X_MAIN}" count="{len(strings)}" '
+                f'uniqueCount="{len(strings)}">{shared}</sst>',
+            ),
+            (
+                "xl/worksheets/sheet1.xml",
+                f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{_X_MAIN}">'
+                f'<sheetData>{"".join(sheet_rows)}</sheetData></worksheet>',
+            ),
+        ]
+    )
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_bytes(pages: List[List[str]]) -> bytes:
+    """A minimal PDF with one Helvetica text line per entry of each page (ASCII only)."""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode("ascii"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, lines in zip(page_ids, pages):
+        body = " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {body} ET".encode("latin-1")
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+            ).encode("ascii")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _write_text(w: _Writer, directories: List[str], count: int) -> None:
+    rng = w.rng
+    for i in range(count):
+        codec, ext, japanese = _TEXT_FLAVOURS[i % len(_TEXT_FLAVOURS)]
+        text = "\r\n".join(w.lines(rng.randint(100, 1200), japanese)) + "\r\n"
+        w.write(f"{rng.choice(directories)}text{i:05d}.{ext}", text.encode(codec), f"text:{codec}")
+
+
+def _write_large_logs(w: _Writer, count: int) -> None:
+    for i in range(count):
+        text = "\n".join(w.lines(60000)) + "\n"
+        w.write(f"logs/app-{i:02d}.log", text.encode("utf-8"), "text:large")
+
+
+def _write_binaries(w: _Writer, directories: List[str], count: int) -> None:
+    rng = w.rng
+    for i in range(count):
+        ext = ("bin", "dat", "png", "exe")[i % 4]
+        size = rng.randint(4 * 1024, 64 * 1024)
+        # Same bytes as Random.randbytes, which needs Python 3.9.
+        data = rng.getrandbits(size * 8).to_bytes(size, "little")
+        w.write(f"{rng.choice(directories)}blob{i:04d}.{ext}", data, "binary")
+
+
+def _write_archives(w: _Writer, count: int) -> None:
+    for i in range(count):
+        members = [(f"logs/part{j:02d}.log", "\n".join(w.lines(300)).encode("utf-8")) for j in range(20)]
+        inner = _zip_bytes([(f"inner{j}.txt", "\n".join(w.lines(200)).encode("utf-8")) for j in range(5)])
+        w.write(f"archives/bundle{i:03d}.zip", _zip_bytes(members + [("nested/inner.zip", inner)]), "zip")
+        members = [(f"var/log/app{j:02d}.log", "\n".join(w.lines(300)).encode("utf-8")) for j in range(20)]
+        w.write(f"archives/rotated{i:03d}.tar.gz", _tar_gz_bytes(members), "tar.gz")
+        data = "\n".join(w.lines(2000)).encode("utf-8")
+        w.write(f"archives/app{i:03d}.log.gz", gzip.compress(data, mtime=0), "gz")
+
+
+def _write_documents(w: _Writer, count: int) -> None:
+    for i in range(count):
+        w.write(f"docs/report{i:03d}.docx", _docx_bytes(w.lines(400, japanese=0.7)), "docx")
+        rows = [w.lines(4, japanese=0.7) for _ in range(200)]
+        w.write(f"docs/sheet{i:03d}.xlsx", _xlsx_bytes(rows), "xlsx")
+        pages = [w.lines(60) for _ in range(8)]
+        w.write(f"docs/manual{i:03d}.pdf", _pdf_bytes(pages), "pdf")
+
+
+def generate_corpus(root: str, seed: int = 1, scale: int = 1) -> dict:
+    """(Re)create the corpus under ``root/tree`` and return its manifest."""
+
+    tree = os.path.join(root, TREE_NAME)
+    if os.path.isdir(tree):
+        shutil.rmtree(tree)
+    scale = max(1, scale)
+    w = _Writer(tree, seed)
+    directories = _directories(TREE_DEPTH, TREE_FANOUT)
+    _write_text(w, directories, 300 * scale)
+    _write_large_logs(w, 2 * scale)
+    _write_binaries(w, directories, 40 * scale)
+    _write_archives(w, 5 * scale)
+    _write_documents(w, 5 * scale)
+    manifest = {
+        "version": CORPUS_VERSION,
+        "seed": seed,
+        "scale": scale,
+        "needle": NEEDLE,
+        "files": w.files,
+        "bytes": w.bytes,
+        "kinds": w.kinds,
+    }
+    with open(os.path.join(root, MANIFEST_NAME), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def ensure_corpus(root: str, seed: int = 1, scale: int = 1) -> dict:
+    """Return the manifest of the corpus in *root*, generating it unless it already matches."""
+
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        if (
+            manifest.get("version") == CORPUS_VERSION
+            and manifest.get("seed") == seed
+            and manifest.get("scale") == max(1, scale)
+            and os.path.isdir(os.path.join(root, TREE_NAME))
+        ):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return generate_corpus(root, seed, scale)
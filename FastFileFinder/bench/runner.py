@@ -0,0 +1,271 @@
+"""Run fastfilefinder_scan.py over a corpus and measure it.
+
+Each configuration runs either in-process (``main()`` called inside a fresh
+spawned interpreter, so import time is excluded and peak RSS is per run) or
+as a subprocess (the way the GUI starts it, start-up included). The scanner
+output is read as it arrives to time the first hit and to take the file and
+hit counts from ``#done``.
+"""
+
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+SCANNER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FastFileFinder")
+SCANNER = os.path.join(SCANNER_DIR, "fastfilefinder_scan.py")
+
+REPORT_SCHEMA = 1
+
+
+def scanner_argv(folder: str, query: str, engine: str, workers: int) -> List[str]:
+    """Arguments of one run: every extractor on, caches off so each run starts cold."""
+
+    return [
+        "--folder", folder,
+        "--query", query,
+        "--recursive",
+        "--zip",
+        "--word",
+        "--excel",
+        "--pdf",
+        "--engine", engine,
+        "--max-workers", str(workers),
+        "--cache-size", "0",
+        "--result-cache-size", "0",
+    ]
+
+
+class _OutputProbe:
+    """Consumes scanner output, noting when the first hit arrived and the ``#done`` counts."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.first_hit: Optional[float] = None
+        self.files = 0
+        self.hits = 0
+        self._partial = ""
+
+    def feed_line(self, line: str) -> None:
+        if not line:
+            return
+        if not line.startswith("#"):
+            if self.first_hit is None:
+                self.first_hit = time.perf_counter() - self.start
+        elif line.startswith("#done\t"):
+            fields = line.split("\t")
+            self.files = int(fields[1])
+            self.hits = int(fields[2])
+
+    # File-like interface for running main() in-process.
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.feed_line(line)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if children:
+            peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil  # optional, for Windows
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+def _inprocess_child(argv: List[str], conn) -> None:
+    sys.path.insert(0, SCANNER_DIR)
+    import fastfilefinder_scan as scanner
+
+    probe = _OutputProbe(0.0)
+    sys.stdout = probe
+    sys.stderr = open(os.devnull, "w", encoding="utf-8")
+    sys.argv = [SCANNER] + argv
+    probe.start = time.perf_counter()
+    scanner.main()
+    elapsed = time.perf_counter() - probe.start
+    conn.send(
+        {
+            "elapsed_s": elapsed,
+            "first_hit_s": probe.first_hit,
+            "files": probe.files,
+            "hits": probe.hits,
+            "peak_rss_mb": _peak_rss_mb(children=True),
+        }
+    )
+    conn.close()
+
+
+def run_inprocess(argv: List[str]) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    child = ctx.Process(target=_inprocess_child, args=(argv, sender), name="bench-inprocess")
+    child.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        child.join()
+        raise RuntimeError(f"in-process run failed (exit code {child.exitcode})")
+    child.join()
+    return result
+
+
+def run_subprocess(argv: List[str]) -> dict:
+    start = time.perf_counter()
+    probe = _OutputProbe(start)
+    proc = subprocess.Popen(
+        [sys.executable, SCANNER] + argv,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    for raw in proc.stdout:
+        probe.feed_line(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+    proc.stdout.close()
+    peak = None
+    if hasattr(os, "wait4"):
+        # wait4 reports the peak RSS of this child (and its pool workers).
+        _, status, usage = os.wait4(proc.pid, 0)
+        # os.waitstatus_to_exitcode needs Python 3.9.
+        proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        peak = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    else:
+        proc.wait()
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"scanner exited with code {proc.returncode}")
+    return {
+        "elapsed_s": elapsed,
+        "first_hit_s": probe.first_hit,
+        "files": probe.files,
+        "hits": probe.hits,
+        "peak_rss_mb": peak,
+    }
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=SCANNER_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_benchmarks(
+    manifest: dict,
+    folder: str,
+    modes: List[str],
+    engines: List[str],
+    workers: List[int],
+    repeat: int = 1,
+    query: Optional[str] = None,
+    log=None,
+) -> dict:
+    """Run every ``mode x engine x workers`` combination *repeat* times; returns the report."""
+
+    query = query or manifest["needle"]
+    runners = {"inprocess": run_inprocess, "subprocess": run_subprocess}
+    results = []
+    for mode in modes:
+        for engine in engines:
+            for count in workers:
+                argv = scanner_argv(folder, query, engine, count)
+                samples = []
+                for _ in range(max(1, repeat)):
+                    samples.append(runners[mode](argv))
+                elapsed = _median(sample["elapsed_s"] for sample in samples)
+                result = {
+                    "mode": mode,
+                    "engine": engine,
+                    "workers": count,
+                    "files": samples[-1]["files"],
+                    "hits": samples[-1]["hits"],
+                    "elapsed_s": round(elapsed, 4),
+                    "files_per_s": round(samples[-1]["files"] / elapsed, 1) if elapsed else None,
+                    "mb_per_s": round(manifest["bytes"] / (1024 * 1024) / elapsed, 2) if elapsed else None,
+                    "first_hit_s": _median(sample["first_hit_s"] for sample in samples),
+                    "peak_rss_mb": max(
+                        (sample["peak_rss_mb"] for sample in samples if sample["peak_rss_mb"] is not None),
+                        default=None,
+                    ),
+                    "samples": [round(sample["elapsed_s"], 4) for sample in samples],
+                }
+                if result["first_hit_s"] is not None:
+                    result["first_hit_s"] = round(result["first_hit_s"], 4)
+                if result["peak_rss_mb"] is not None:
+                    result["peak_rss_mb"] = round(result["peak_rss_mb"], 1)
+                results.append(result)
+                if log is not None:
+                    log(
+                        f"{mode} {engine} x{count}: {result['elapsed_s']:.3f}s "
+                        f"{result['files_per_s']} files/s {result['mb_per_s']} MB/s"
+                    )
+    return {
+        "schema": REPORT_SCHEMA,
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "query": query,
+        # scanner_argv keeps both caches off, as they are by default.
+        "caches_enabled": False,
+        "corpus": manifest,
+        "results": results,
+    }
+
+
+def compare_reports(old: dict, new: dict) -> List[str]:
+    """One line per configuration present in both reports, with the relative change."""
+
+    def key(result):
+        return result["mode"], result["engine"], result["workers"]
+
+    previous = {key(result): result for result in old.get("results", [])}
+    lines = []
+    for result in new.get("results", []):
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        parts = [f"{result['mode']} {result['engine']} x{result['workers']}:"]
+        for metric in ("elapsed_s", "first_hit_s", "peak_rss_mb"):
+            a, b = before.get(metric), result.get(metric)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            parts.append(f"{metric} {a} -> {b} ({change})")
+        if before.get("hits") != result.get("hits"):
+            parts.append(f"hits {before.get('hits')} -> {result.get('hits')}")
+        lines.append(" ".join(parts))
+    return lines
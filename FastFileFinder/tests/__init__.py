@@ -0,0 +1,8 @@
+"""Unit tests for fastfilefinder_scan.py (``python -m pytest tests`` or ``python -m unittest``)."""
+
+import os
+import sys
+
+SCANNER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FastFileFinder")
+if SCANNER_DIR not in sys.path:
+    sys.path.insert(0, SCANNER_DIR)
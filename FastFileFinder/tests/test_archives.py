@@ -0,0 +1,65 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+import fastfilefinder_scan as scanner
+from bench.corpus import _docx_bytes, _pdf_bytes, _xlsx_bytes
+
+
+def zip_bytes(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class ArchiveMemberSpoolTest(unittest.TestCase):
+    """Nested zips and documents beyond the in-memory cap go through a temporary file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "outer.zip")
+        inner = zip_bytes(
+            [
+                ("notes.txt", "first\nneedle in inner\n" + "".join(f"line {i * 7919 % 10007}\n" for i in range(2000))),
+                ("report.docx", _docx_bytes(["intro", "needle in docx"])),
+                ("book.xlsx", _xlsx_bytes([["a", "needle in xlsx"]])),
+                ("manual.pdf", _pdf_bytes([["cover"], ["needle in pdf"]])),
+            ]
+        )
+        with open(self.path, "wb") as handle:
+            handle.write(zip_bytes([("inner.zip", inner), ("top.txt", "needle on top\n")]))
+        saved = (scanner.ARCHIVE_MEMBER_MEMORY_BYTES, scanner.EMIT_CAPTURE)
+        self.addCleanup(self.restore, saved)
+        scanner.EMIT_CAPTURE = []
+
+    @staticmethod
+    def restore(saved):
+        scanner.ARCHIVE_MEMBER_MEMORY_BYTES, scanner.EMIT_CAPTURE = saved
+
+    def scan(self):
+        scanner.EMIT_CAPTURE.clear()
+        matcher = scanner.build_matcher(["needle"], False, "and")
+        formats = {"docx": "docx", "xlsx": "xlsx:strings"}
+        if scanner._optional_import("pdf", scanner._import_pdf_reader) is not None:
+            formats["pdf"] = "pdf"
+        scanner.scan_zip(self.path, matcher, set(), 0, formats)
+        return sorted(entry for entry, _, _ in scanner.EMIT_CAPTURE), len(formats)
+
+    def test_small_members_and_spooled_members_match(self):
+        in_memory = self.scan()
+        scanner.ARCHIVE_MEMBER_MEMORY_BYTES = 1024
+        self.assertEqual(self.scan(), in_memory)
+        entries, formats = in_memory
+        self.assertIn("inner.zip/notes.txt", entries)
+        self.assertTrue(any(entry.startswith("inner.zip/report.docx:") for entry in entries))
+        self.assertTrue(any(entry.startswith("inner.zip/book.xlsx:") for entry in entries))
+        self.assertEqual(len(entries), formats + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import threading
+import unittest
+
+import fastfilefinder_scan as scanner
+
+
+class FakeWord:
+    """Stand-in for a ``Word.Application`` COM object."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.crashed = False
+        self.quit_calls = 0
+
+    @property
+    def Documents(self):
+        if self.crashed:
+            raise OSError("RPC server is unavailable")
+        return self
+
+    @property
+    def Count(self):
+        return 0
+
+    def Quit(self):
+        self.quit_calls += 1
+
+
+class FakeWordHost:
+    """Launches :class:`FakeWord` instances and converts paths with them."""
+
+    def __init__(self):
+        self.apps = []
+        self.converted = []
+        self.fail = set()
+        self._lock = threading.Lock()
+
+    def launch(self):
+        with self._lock:
+            app = FakeWord(len(self.apps))
+            self.apps.append(app)
+            return app
+
+    def convert(self, app, path):
+        if app.quit_calls:
+            raise AssertionError(f"{path} converted by a Word that was closed")
+        self.converted.append((app.number, path))
+        if path in self.fail:
+            raise scanner.DocConversionError("Open", path)
+        return [f"{path} by {app.number}"]
+
+
+class DocWorkerPoolTest(unittest.TestCase):
+    def make_pool(self, recycle_after: int = 100) -> "scanner.DocWorkerPool":
+        self.host = FakeWordHost()
+        pool = scanner.DocWorkerPool(True, self.host.launch, self.host.convert, recycle_after)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_reuses_one_session(self):
+        pool = self.make_pool()
+        self.assertEqual([pool.convert(f"{i}.doc") for i in range(3)], [[f"{i}.doc by 0"] for i in range(3)])
+        self.assertEqual(len(self.host.apps), 1)
+        self.assertEqual(self.host.apps[0].quit_calls, 0)
+
+    def test_recycles_after_threshold(self):
+        pool = self.make_pool(recycle_after=2)
+        for i in range(5):
+            pool.convert(f"{i}.doc")
+        self.assertEqual([number for number, _ in self.host.converted], [0, 0, 1, 1, 2])
+        self.assertEqual([app.quit_calls for app in self.host.apps], [1, 1, 0])
+        pool.shutdown()
+        self.assertEqual(self.host.apps[2].quit_calls, 1)
+
+    def test_failed_conversion_replaces_session(self):
+        pool = self.make_pool()
+        self.host.fail.add("bad.doc")
+        pool.convert("a.doc")
+        with self.assertRaises(scanner.DocConversionError):
+            pool.convert("bad.doc")
+        self.assertEqual(self.host.apps[0].quit_calls, 1)
+        self.assertEqual(pool.convert("b.doc"), ["b.doc by 1"])
+
+    def test_crashed_session_is_relaunched(self):
+        pool = self.make_pool()
+        pool.convert("a.doc")
+        self.host.apps[0].crashed = True
+        self.assertEqual(pool.convert("b.doc"), ["b.doc by 1"])
+        self.assertEqual(len(self.host.apps), 2)
+
+    def test_launch_failure_is_reported_and_retried(self):
+        pool = self.make_pool()
+        launch = self.host.launch
+        attempts = []
+
+        def flaky_launch():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise scanner.DocConversionError("Dispatch", "Word.Application")
+            return launch()
+
+        pool._launcher = flaky_launch
+        with self.assertRaises(scanner.DocConversionError):
+            pool.convert("a.doc")
+        self.assertEqual(pool.convert("b.doc"), ["b.doc by 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
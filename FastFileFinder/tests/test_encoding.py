@@ -0,0 +1,62 @@
+import random
+import unittest
+
+import fastfilefinder_scan as scanner
+
+KANA = "あいうえおかきくけこさしすせそたちつてと"
+SAMPLE_CHARS = scanner.TEXT_NUL_SAMPLE_BYTES // 2
+
+
+def japanese_text(extra: str = "", count: int = 0) -> str:
+    """One sniff sample of kana lines with *count* characters spread out and replaced by *extra*."""
+    chars = list((KANA[:19] + "\n") * (SAMPLE_CHARS // 20 + 1))[:SAMPLE_CHARS]
+    for index in range(count):
+        position = index * (SAMPLE_CHARS // count) + 1
+        chars[position] = extra
+    return "".join(chars)
+
+
+class SniffTextEncodingTest(unittest.TestCase):
+    def sniff(self, data: bytes):
+        return scanner.sniff_text_encoding(data, True)
+
+    def test_boms(self):
+        self.assertEqual(self.sniff(b"\xef\xbb\xbfabc"), ("utf-8", 3))
+        self.assertEqual(self.sniff(b"\xff\xfea\x00"), ("utf-16-le", 2))
+        self.assertEqual(self.sniff(b"\xfe\xff\x00a"), ("utf-16-be", 2))
+
+    def test_ascii_utf16_without_bom(self):
+        self.assertEqual(self.sniff("hello\r\n".encode("utf-16-le") * 50), ("utf-16-le", 0))
+        self.assertEqual(self.sniff("hello\r\n".encode("utf-16-be") * 50), ("utf-16-be", 0))
+
+    def test_japanese_utf16_without_bom(self):
+        # Only the line breaks carry a NUL, far below the dense-NUL check.
+        text = japanese_text()
+        self.assertEqual(self.sniff(text.encode("utf-16-le")), ("utf-16-le", 0))
+        self.assertEqual(self.sniff(text.encode("utf-16-be")), ("utf-16-be", 0))
+
+    def test_other_lane_ratio(self):
+        # U+4E00 is 00 4E in UTF-16-LE, a NUL on the lane the line breaks do not use.
+        self.assertEqual(scanner.UTF16_OTHER_LANE_RATIO, 0.05)
+        newlines = japanese_text().count("\n")
+        self.assertEqual(newlines, 102)
+        self.assertEqual(self.sniff(japanese_text("\u4e00", 4).encode("utf-16-le")), ("utf-16-le", 0))
+        self.assertEqual(self.sniff(japanese_text("\u4e00", 7).encode("utf-16-le")), (None, 0))
+
+    def test_nonprintable_ratio(self):
+        # U+E001 (private use) is not printable and has no NUL byte.
+        self.assertEqual(scanner.UTF16_NONPRINTABLE_RATIO, 0.02)
+        self.assertEqual(self.sniff(japanese_text("\ue001", 30).encode("utf-16-le")), ("utf-16-le", 0))
+        self.assertEqual(self.sniff(japanese_text("\ue001", 60).encode("utf-16-le")), (None, 0))
+
+    def test_binary_with_nuls_on_one_lane(self):
+        rng = random.Random(8)
+        for _ in range(50):
+            data = bytearray(rng.randrange(1, 256) for _ in range(scanner.TEXT_NUL_SAMPLE_BYTES))
+            for index in range(1, len(data), 40):
+                data[index] = 0
+            self.assertEqual(self.sniff(bytes(data)), (None, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
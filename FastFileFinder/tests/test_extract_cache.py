@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import fastfilefinder_scan as scanner
+
+
+class ExtractCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "a.pdf")
+        with open(self.path, "wb") as handle:
+            handle.write(b"%PDF")
+        self.cache = scanner.ExtractCache(os.path.join(directory.name, "cache"), 1024 * 1024)
+        self.addCleanup(self.cache.close)
+        self.extracted = []
+
+    def extract(self, path, count=100, text="line"):
+        for index in range(count):
+            self.extracted.append(index)
+            yield index + 1, "page 1", f"{text} {index}"
+
+    def test_streams_records_on_a_miss(self):
+        records = self.cache.records(self.path, "pdf", self.extract)
+        self.assertEqual(next(records), (1, "page 1", "line 0"))
+        self.assertEqual(self.extracted, [0])
+        records.close()
+
+    def test_stores_only_complete_extractions(self):
+        records = self.cache.records(self.path, "pdf", self.extract)
+        next(records)
+        records.close()
+        self.assertEqual(self.cache.stored, 0)
+        self.assertEqual(len(list(self.cache.records(self.path, "pdf", self.extract))), 100)
+        self.assertEqual(self.cache.stored, 1)
+        self.extracted.clear()
+        self.assertEqual(len(list(self.cache.records(self.path, "pdf", self.extract))), 100)
+        self.assertEqual((self.extracted, self.cache.hits), ([], 1))
+
+    def test_extraction_error_is_not_stored(self):
+        def failing(path):
+            yield 1, "", "first"
+            raise scanner.ExtractionError("broken")
+
+        records = self.cache.records(self.path, "pdf", failing)
+        self.assertEqual(next(records), (1, "", "first"))
+        with self.assertRaises(scanner.ExtractionError):
+            next(records)
+        self.assertEqual(self.cache.stored, 0)
+
+    def test_entries_over_the_budget_are_not_collected(self):
+        records = list(self.cache.records(self.path, "pdf", lambda path: self.extract(path, 3, "x" * 600 * 1024)))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(self.cache.stored, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+
+import fastfilefinder_scan as scanner
+
+PAGES = 400
+
+
+class InlinePool:
+    """Runs page ranges on submit and counts how many were submitted."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+def fake_pages(path, start, stop):
+    return [(f"page {index + 1} needle", None) for index in range(start, stop)]
+
+
+def page_records(path):
+    for page_index, (text, _) in enumerate(scanner._iter_pdf_pages_parallel(path, PAGES), 1):
+        yield 1, f"page {page_index}", text
+
+
+class PdfEarlyStopTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "big.pdf")
+        with open(self.path, "wb") as handle:
+            handle.write(b"%PDF")
+        self.pool = InlinePool()
+        saved = (scanner._pdf_page_pool, scanner._extract_pdf_pages, scanner.PDF_PAGE_WORKERS, scanner.EMIT_CAPTURE)
+        self.addCleanup(self.restore, saved)
+        scanner._pdf_page_pool = lambda: self.pool
+        scanner._extract_pdf_pages = fake_pages
+        scanner.PDF_PAGE_WORKERS = 4
+        scanner.EMIT_CAPTURE = []
+        self.matcher = scanner.build_matcher(["needle"], False, "and")
+
+    @staticmethod
+    def restore(saved):
+        scanner._pdf_page_pool, scanner._extract_pdf_pages, scanner.PDF_PAGE_WORKERS, scanner.EMIT_CAPTURE = saved
+        scanner.close_extract_cache()
+
+    def scan(self, perfile):
+        records = scanner.cached_records(self.path, "pdf", page_records)
+        return scanner.emit_records(self.path, records, self.matcher, perfile)
+
+    def test_perfile_stops_submitting_ranges(self):
+        self.assertEqual(self.scan(1), 1)
+        window = scanner.PDF_PAGE_WORKERS * scanner.PDF_PAGE_WINDOW_FACTOR
+        self.assertEqual(self.pool.submitted, window + 1)
+
+    def test_perfile_stops_through_the_extract_cache(self):
+        scanner.configure_extract_cache(os.path.dirname(self.path), 16)
+        self.assertEqual(self.scan(1), 1)
+        window = scanner.PDF_PAGE_WORKERS * scanner.PDF_PAGE_WINDOW_FACTOR
+        self.assertEqual(self.pool.submitted, window + 1)
+        self.assertEqual(scanner.EXTRACT_CACHE.stored, 0)
+
+        self.assertEqual(self.scan(0), PAGES)
+        self.assertEqual(scanner.EXTRACT_CACHE.stored, 1)
+        submitted = self.pool.submitted
+        self.assertEqual(self.scan(1), 1)
+        self.assertEqual(self.pool.submitted, submitted)
+
+
+if __name__ == "__main__":
+    unittest.main()
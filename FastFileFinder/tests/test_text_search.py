@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import fastfilefinder_scan as scanner
+
+
+class Utf16ByteSearchTest(unittest.TestCase):
+    """The byte-level fast path must only accept newlines and hits on code-unit boundaries."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".txt")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        scanner.EMIT_CAPTURE = []
+        self.addCleanup(setattr, scanner, "EMIT_CAPTURE", None)
+
+    def search(self, text: str, query: str, codec: str = "utf-16-le", bom: bytes = b"\xff\xfe"):
+        with open(self.path, "wb") as handle:
+            handle.write(bom + text.encode(codec))
+        scanner.EMIT_CAPTURE.clear()
+        matcher = scanner.build_matcher([query], False, "and")
+        self.assertIsNotNone(scanner.scan_text_bytes(self.path, matcher, 0))
+        return [(lineno, line.rstrip("\r\n")) for _, lineno, line in scanner.EMIT_CAPTURE]
+
+    def test_newline_bytes_across_code_units(self):
+        # U+0A41 U+4E00 is b"\x41\x0a\x00\x4e" in UTF-16-LE: a "\n" at an odd offset.
+        text = "abੁ一cd\r\nx\r\nA hello\r\n"
+        self.assertEqual(self.search(text, "hello"), [(3, "A hello")])
+
+    def test_needle_across_code_units(self):
+        # "A上" is b"\x41\x00\x0a\x4e", which holds U+0A00 at an odd offset.
+        self.assertEqual(self.search("abੁ一cd\r\nA上 hello\r\n" * 2, "਀"), [])
+
+    def test_big_endian(self):
+        text = "上ੁ\nfoo\nbar foo\n"
+        self.assertEqual(
+            self.search(text, "foo", "utf-16-be", b"\xfe\xff"),
+            [(2, "foo"), (3, "bar foo")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()